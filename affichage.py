@@ -0,0 +1,39 @@
+"""Construction paginée de la liste des restaurants affichée par app.py."""
+import math
+import urllib.parse
+
+COLONNES_LISTE = ["nom", "ville", "spécialité", "niveau de prix (libellé)"]
+TAILLES_PAGE = [25, 50, 100, 200]
+
+
+def nombre_pages(nb_resultats, taille_page):
+    return max(1, math.ceil(nb_resultats / taille_page))
+
+
+def liens_itineraires(user_coords, latitudes, longitudes):
+    """URLs Google Maps vers chaque restaurant, calculées en une passe (None sans coordonnées)."""
+    origin = urllib.parse.quote(f"{user_coords[0]},{user_coords[1]}")
+    # quote("lat,lon") ne fait qu'encoder la virgule
+    destinations = latitudes.astype(str) + "%2C" + longitudes.astype(str)
+    urls = (
+        "https://www.google.com/maps/dir/?api=1&origin=" + origin
+        + "&destination=" + destinations + "&travelmode=driving"
+    )
+    return urls.where(latitudes.notna() & longitudes.notna(), None)
+
+
+def page_resultats(data, page, taille_page, user_coords=None):
+    """Lignes de la page ``page`` (à partir de 1), prêtes pour st.dataframe."""
+    debut = (page - 1) * taille_page
+    lignes = data.iloc[debut:debut + taille_page]
+    colonnes = COLONNES_LISTE + (["distance_km"] if "distance_km" in data.columns else [])
+    page_df = lignes[colonnes].reset_index(drop=True)
+    if "distance_km" in page_df.columns:
+        page_df["distance_km"] = page_df["distance_km"].round(2)
+    if user_coords:
+        page_df["itinéraire"] = liens_itineraires(
+            user_coords,
+            lignes["latitude"].reset_index(drop=True),
+            lignes["longitude"].reset_index(drop=True),
+        )
+    return page_df
@@ -1,22 +1,29 @@
 import streamlit as st
-import duckdb
-import pandas as pd
-from dotenv import load_dotenv
-import os
-from geopy.distance import geodesic
-from streamlit_javascript import st_javascript
-import urllib.parse  
-from geopy.geocoders import Nominatim
-
-table_name= "restaurants_france_specialtiescompletdef"
-
-# Chargement des variables d'environnement
-load_dotenv()
-token = os.getenv("mother_duck_token")
+from affichage import TAILLES_PAGE, nombre_pages, page_resultats
+from candidats import candidats_session
+from chat import moteur as moteur_chat
+from demarrage import Demarrage, prechauffer
+from geocodage import ville_proche
+from instrumentation import afficher_panneau, demarrer_rerun, span
+import moteur
+from moteur import RAYON_MAX
+from noms import index_noms
+from voisins import index_voisins
+import db
+
+# Attente maximale (s) des tâches du démarrage avant d'afficher sans elles
+DELAI_VOCABULAIRES = 15
+DELAI_GEOCODAGE = 2
+NB_RESULTATS_NOM = 50
 
 
 # Config page
 st.set_page_config(page_title="Restaurants en France", layout="wide")
+demarrer_rerun(st.session_state, "app")
+
+# Connexion et requêtes des filtres partent pendant l'attente du navigateur
+demarrage = Demarrage()
+demarrage.lancer("vocabulaires", moteur.vocabulaires)
 
 # Titre
 st.markdown("""
@@ -28,8 +35,11 @@ st.markdown("""
 </p>
 """, unsafe_allow_html=True)
 
-# Géolocalisation automatique
-coords = st_javascript("""await new Promise((resolve, reject) => {
+# Géolocalisation automatique ; le composant (plusieurs centaines de ms
+# d'import au démarrage) se charge pendant la requête des vocabulaires
+with span("geolocalisation"):
+    from streamlit_javascript import st_javascript
+    coords = st_javascript("""await new Promise((resolve, reject) => {
     navigator.geolocation.getCurrentPosition(
         (pos) => {
             resolve({
@@ -48,38 +58,27 @@ if coords is None:
     st.info("📍 Cliquez sur 'Autoriser' dans le popup du navigateur pour activer la géolocalisation.")
 elif isinstance(coords, dict) and "latitude" in coords:
     user_coords = (coords["latitude"], coords["longitude"])
-    
-    # Géocodage inverse avec Nominatim (OpenStreetMap)
-    geolocator = Nominatim(user_agent="miam_guide_app")
-    try:
-        location = geolocator.reverse(user_coords, language='fr')
-        if location and "address" in location.raw:
-            ville_detectee = location.raw["address"].get("city") or \
-                             location.raw["address"].get("town") or \
-                             location.raw["address"].get("village") or \
-                             location.raw["address"].get("municipality") or "Inconnue"
-            st.success(f"📍 Position détectée : {ville_detectee}")
-        else:
-            st.success(f"📍 Position détectée : {user_coords} (ville inconnue)")
-    except Exception as e:
-        st.warning(f"📍 Coordonnées détectées : {user_coords} (erreur géolocalisation : {e})")
-
-# Connexion à la DB
-db_path = f"md:my_db?motherduck_token={token}"
-con = duckdb.connect(db_path)
-
-# Vérification des tables existantes
-tables = con.execute("SHOW TABLES").fetchall()
-
-
-# Valeurs uniques pour filtres
-specialites = [s[0].strip() for s in con.execute(f'SELECT DISTINCT "spécialité" FROM {table_name} ORDER BY "spécialité"').fetchall()]
-prix = [p[0].strip() for p in con.execute(f'SELECT DISTINCT "niveau de prix (libellé)" FROM {table_name} ORDER BY "niveau de prix (libellé)"').fetchall()]
+
+    # Géocodage inverse local (villes connues de la base, cache sur disque),
+    # affiché une fois les résultats calculés
+    demarrage.lancer("geocodage", ville_proche, *user_coords)
+    message_position = st.empty()
+
+# Le moteur du chat et l'index des noms se construisent en arrière-plan,
+# une fois par processus
+prechauffer("chat", moteur_chat)
+index_noms(attendre=False)
+
+specialites, codes_prix = demarrage.resultat("vocabulaires", DELAI_VOCABULAIRES, defaut=([], {}))
+if not specialites and not codes_prix:
+    st.warning("⏳ La base met du temps à répondre : les filtres par spécialité et par prix sont indisponibles.")
+prix = list(codes_prix)
 
 # Filtres utilisateur
 specialite_selection = st.selectbox("🥗 Choisissez une spécialité", ["Toutes"] + specialites)
 note_min = st.slider("⭐ Note minimale", min_value=4.0, max_value=5.0, value=4.0, step=0.1)
 prix_selection = st.selectbox("💰 Choisissez une fourchette de prix", ["Toutes"] + prix)
+nom_recherche = st.text_input("🔤 Rechercher un restaurant par son nom", placeholder="ex. : pizzeria bella").strip()
 
 # Info parking
 st.markdown("""
@@ -102,76 +101,82 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Construction de la requête SQL
-query = f"""
-SELECT ville, "spécialité", "niveau de prix (libellé)", latitude, longitude, nom
-FROM {table_name}
-WHERE 1=1
-"""
-params_sql = []
-
-if specialite_selection != "Toutes":
-    query += ' AND TRIM("spécialité") = ?'
-    params_sql.append(specialite_selection.strip())
-
-if prix_selection != "Toutes":
-    query += ' AND TRIM("niveau de prix (libellé)") = ?'
-    params_sql.append(prix_selection.strip())
-
-data = con.execute(query, tuple(params_sql)).fetchdf()
-
-# Si coordonnées disponibles, filtrer par distance
-if user_coords and not data.empty:
-    rayon = st.slider("🔎 Rayon de recherche (km)", 1, 50, 10)
-    data["distance_km"] = data.apply(
-        lambda row: geodesic(user_coords, (row["latitude"], row["longitude"])).km
-        if pd.notnull(row["latitude"]) and pd.notnull(row["longitude"]) else None,
-        axis=1
-    )
-    data = data.sort_values("distance_km")
-    data = data[data["distance_km"] <= rayon]
+# Filtres catégoriels (None : pas de filtre)
+specialite_filtre = None if specialite_selection == "Toutes" else specialite_selection
+prix_filtre = None if prix_selection == "Toutes" else codes_prix[prix_selection]
+
+mode_recherche = None
+if user_coords and not nom_recherche:
+    mode_recherche = st.radio("🧭 Recherche", ["Dans un rayon", "Les plus proches"], horizontal=True)
+
+if nom_recherche:
+    # Index de trigrammes local : ni requête ni parcours de la table
+    index_nom = index_noms(attendre=False)
+    if index_nom is not None:
+        with span("noms"):
+            data = index_nom.rechercher(nom_recherche, NB_RESULTATS_NOM, user_coords)
+        st.success(f"Restaurants dont le nom ressemble à « {nom_recherche} » : {len(data)} (les autres filtres ne s'appliquent pas)")
+    else:
+        # Index en construction : recherche exacte des mots en SQL
+        with span("noms_sql"):
+            data = moteur.rechercher_nom(nom_recherche, NB_RESULTATS_NOM, user_coords)
+        st.info("⏳ L'index des noms est en cours de construction : seuls les noms contenant tous les mots saisis sont trouvés.")
+        st.success(f"Restaurants dont le nom contient « {nom_recherche} » : {len(data)} (les autres filtres ne s'appliquent pas)")
+elif mode_recherche == "Les plus proches":
+    nb_voisins = st.slider("🔎 Nombre de restaurants", 5, 100, 20)
+    # Index spatial persistant : seuls les voisins sont parcourus
+    with span("voisins"):
+        data = index_voisins().plus_proches(
+            user_coords[0], user_coords[1], nb_voisins,
+            specialite=specialite_filtre,
+            prix_code=prix_filtre,
+            note_min=note_min,
+        )
+    st.success(f"Les {len(data)} restaurants les plus proches")
+elif user_coords:
+    rayon = st.slider("🔎 Rayon de recherche (km)", 1, RAYON_MAX, 10)
+    # Les candidats du rayon maximal sont chargés et triés une fois par
+    # position et filtres catégoriels ; rayon et note minimale se filtrent
+    # ensuite en mémoire.
+    cle_candidats = (db.version_table(moteur.TABLE), user_coords, specialite_selection, prix_selection)
+    with span("candidats"):
+        candidats = candidats_session(
+            st.session_state,
+            cle_candidats,
+            lambda: moteur.charger_candidats(user_coords, specialite_filtre, prix_filtre),
+            user_coords,
+        )
+    with span("rayon", lignes=len(candidats)):
+        data = candidats.filtrer(rayon, note_min)
     st.success(f"Restaurants dans un rayon de {rayon} km : {len(data)}")
 else:
+    data = moteur.rechercher(specialite_filtre, prix_filtre, note_min)
     st.info(f"Restaurants trouvés avec les filtres : {len(data)}")
 
-# Affichage liste des restaurants
-if not data.empty:
-    st.markdown("### Liste des restaurants correspondant à vos critères :")
-    for idx, row in data.iterrows():
-        nom = row["nom"]
-        ville = row["ville"]
-        specialite = row["spécialité"]
-        prix = row["niveau de prix (libellé)"]
-        lat = row["latitude"]
-        lon = row["longitude"]
-        dist = None
-        if "distance_km" in data.columns:
-            dist = round(row["distance_km"], 2)
-
-        resto_info = f"**{nom}** - {ville} - {specialite} - {prix}"
-        if dist is not None:
-            resto_info += f" - {dist} km"
-
-        st.write(resto_info)
-
-        if user_coords and pd.notnull(lat) and pd.notnull(lon):
-            origin = f"{user_coords[0]},{user_coords[1]}"
-            destination = f"{lat},{lon}"
-            url = f"https://www.google.com/maps/dir/?api=1&origin={urllib.parse.quote(origin)}&destination={urllib.parse.quote(destination)}&travelmode=driving"
-            st.markdown(f"[➡️ Itinéraire vers ce restaurant]({url})", unsafe_allow_html=True)
-
-        st.markdown("---")
-
-# Affichage tableau résumé
-if not data.empty:
-    if "distance_km" in data.columns:
-        data_display = data[["nom", "ville", "spécialité", "niveau de prix (libellé)", "distance_km"]].copy()
-        data_display["distance_km"] = data_display["distance_km"].round(2)
+if user_coords:
+    # Une erreur du géocodage n'empêche pas d'afficher les résultats
+    ville_detectee = demarrage.resultat("geocodage", DELAI_GEOCODAGE, facultatif=True)
+    if ville_detectee:
+        message_position.success(f"📍 Position détectée : {ville_detectee}")
     else:
-        data_display = data[["nom", "ville", "spécialité", "niveau de prix (libellé)"]]
+        message_position.success(f"📍 Position détectée : {user_coords} (ville inconnue)")
 
+# Affichage liste des restaurants, page par page dans un seul tableau
+if not data.empty:
     st.markdown("### Liste des restaurants correspondant à vos critères :")
-    st.dataframe(data_display.reset_index(drop=True))
+    col_taille, col_page = st.columns(2)
+    taille_page = col_taille.selectbox("Restaurants par page", TAILLES_PAGE)
+    page = col_page.number_input("Page", min_value=1, max_value=nombre_pages(len(data), taille_page), value=1)
+    with span("liste"):
+        page_df = page_resultats(data, page, taille_page, user_coords)
+    st.dataframe(
+        page_df,
+        hide_index=True,
+        column_config={
+            "distance_km": st.column_config.NumberColumn("distance_km", format="%.2f km"),
+            "itinéraire": st.column_config.LinkColumn("Itinéraire", display_text="➡️ Itinéraire"),
+        },
+    )
 
 # Chat IA basique
 st.markdown("---")
@@ -191,32 +196,11 @@ if prompt := st.chat_input("🤖 Posez une question, par exemple : Quel est le t
     st.chat_message("user").write(prompt)
     st.session_state["messages"].append({"role": "user", "content": prompt})
 
-    villes = [v[0].strip() for v in con.execute(f"SELECT DISTINCT ville FROM {table_name} ORDER BY ville").fetchall()]
-    ville_mentionnee = None
-    prompt_lower = prompt.lower()
-    for ville in villes:
-        if ville.lower() in prompt_lower:
-            ville_mentionnee = ville
-            break
-
-    if ville_mentionnee:
-        top = con.execute(f"""
-            SELECT "spécialité", COUNT(*) AS nb
-            FROM {table_name}
-            WHERE LOWER(TRIM(ville)) = ?
-            GROUP BY "spécialité"
-            ORDER BY nb DESC
-            LIMIT 1
-        """, (ville_mentionnee.lower(),)).fetchone()
-
-        if top:
-            response = f"🍽️ À {ville_mentionnee}, la spécialité la plus représentée est : **{top[0]}** avec {top[1]} restaurants."
-        else:
-            response = f"❌ Je n'ai trouvé aucune spécialité dans la base pour la ville **{ville_mentionnee}**."
-    else:
-        response = "⚠️ Je n'ai pas détecté de ville dans votre question. Merci de mentionner une ville connue."
+    # Réponse calculée en mémoire, sans requête
+    with span("chat"):
+        response = moteur_chat().repondre(prompt)
 
     st.chat_message("assistant").write(response)
     st.session_state["messages"].append({"role": "assistant", "content": response})
 
-
+afficher_panneau(st)
@@ -0,0 +1,316 @@
+"""Mesure du temps de chaque étape de l'application sur des données synthétiques.
+
+Usage : python -m benchmarks.bench 10k 100k [--repetitions 20] [--comparer]
+
+Pour chaque taille, la base synthétique est générée si besoin, puis chaque
+étape est exécutée plusieurs fois sans cache de résultats. Les percentiles
+de latence et la mémoire maximale sont écrits dans
+benchmarks/resultats/<taille>.json ; avec --comparer, les étapes plus lentes
+que la référence de plus de --tolerance sont signalées.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.generateur import chemin_bench, generer, taille
+from cache import taille_estimee
+import config
+import db
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(__file__), "resultats")
+# Position de référence : centre de Lyon
+POSITION = (45.764, 4.8357)
+RAYON = 10
+PAGE = 50
+CATEGORIES = ("ville", "spécialité", "niveau de prix (libellé)")
+
+
+def imports_page(page):
+    """Instructions d'import de premier niveau d'une page Streamlit."""
+    with open(os.path.join(RACINE, page), encoding="utf-8") as f:
+        arbre = ast.parse(f.read())
+    return "\n".join(ast.unparse(n) for n in arbre.body if isinstance(n, (ast.Import, ast.ImportFrom)))
+
+
+def _importer(page):
+    # Nouveau processus : aucun module n'est encore chargé, comme au
+    # démarrage du serveur Streamlit
+    subprocess.run([sys.executable, "-c", imports_page(page)], cwd=RACINE, check=True, capture_output=True)
+
+
+def etape_import_app(ctx):
+    _importer("app.py")
+
+
+def etape_import_analyses(ctx):
+    _importer(os.path.join("pages", "Analyses.py"))
+
+
+def _rerun(ctx, page):
+    from streamlit.testing.v1 import AppTest
+    import graphiques
+
+    graphiques.cache_figures.vider()
+    if page not in ctx:
+        ctx[page] = AppTest.from_file(os.path.join(RACINE, page), default_timeout=60)
+    # Même session à chaque passage : le premier (non compté) est la
+    # première exécution, les suivants des reruns
+    ctx[page].run()
+    if ctx[page].exception:
+        raise RuntimeError(ctx[page].exception[0].value)
+
+
+def etape_rerun_app(ctx):
+    _rerun(ctx, "app.py")
+
+
+def etape_rerun_analyses(ctx):
+    _rerun(ctx, os.path.join("pages", "Analyses.py"))
+
+
+def etape_vocabulaires(ctx):
+    import moteur
+
+    return moteur.vocabulaires()
+
+
+def etape_requete_filtree(ctx):
+    import moteur
+
+    # Candidats de la recherche par rayon, tels que l'application et le service les chargent
+    ctx["data"] = moteur.charger_candidats(POSITION, "Pizza", None, moteur.RAYON_MAX)
+    return ctx["data"]
+
+
+SQL_TABLE_COMPLETE = f"""
+    SELECT ville, "spécialité", "niveau de prix (libellé)", latitude, longitude, nom
+    FROM {config.TABLE_RESTAURANTS}
+"""
+
+
+def etape_chargement_objets(ctx):
+    # Référence : conversion pandas directe de toute la table
+    return db.executer(SQL_TABLE_COMPLETE).fetchdf()
+
+
+def etape_chargement_arrow(ctx):
+    return db.en_dataframe(db.executer(SQL_TABLE_COMPLETE), CATEGORIES)
+
+
+def etape_candidats(ctx):
+    from candidats import Candidats
+
+    ctx["candidats"] = Candidats(ctx["data"], POSITION)
+
+
+def etape_refiltrage(ctx):
+    # Glissement des curseurs de rayon et de note
+    for rayon in range(1, 51, 7):
+        ctx["candidats"].filtrer(rayon, 4.0 + rayon / 100)
+    # Liste affichée par l'étape liste
+    ctx["resultats"] = ctx["candidats"].filtrer(RAYON)
+
+
+def etape_voisins_construction(ctx):
+    import voisins
+
+    voisins._index.oublier()
+    shutil.rmtree(voisins.DOSSIER_INDEX, ignore_errors=True)
+    ctx["index_voisins"] = voisins.index_voisins()
+
+
+def etape_voisins(ctx):
+    ctx["index_voisins"].plus_proches(*POSITION, 20, specialite="Pizza", note_min=4.0)
+
+
+def etape_noms_construction(ctx):
+    import noms
+
+    noms._index.oublier()
+    shutil.rmtree(noms.DOSSIER_INDEX, ignore_errors=True)
+    ctx["index_noms"] = noms.index_noms()
+
+
+def etape_noms(ctx):
+    # Frappe progressive d'un nom, avec classement par distance
+    for fin in range(1, 15):
+        ctx["index_noms"].rechercher("Restaurant 4217"[:fin], 20, POSITION)
+
+
+def etape_noms_sql(ctx):
+    # Recherche de repli pendant la construction de l'index
+    import moteur
+
+    moteur.rechercher_nom("Restaurant 4217", 20, POSITION)
+
+
+def etape_liste(ctx):
+    from affichage import page_resultats
+
+    page_resultats(ctx["resultats"], 1, PAGE, POSITION)
+
+
+def etape_analyses(ctx):
+    from cube import charger_cube, note_moyenne
+
+    cube = charger_cube()
+    cube_villes = cube.dropna(subset=["spécialité", "ville"])
+    counts = cube_villes.groupby(["ville", "spécialité"])["nombre"].sum().reset_index()
+    top_specs = counts.groupby("spécialité")["nombre"].sum().nlargest(5).index
+    note_moyenne(cube_villes[cube_villes["spécialité"].isin(top_specs)], ["ville", "spécialité"])
+    note_moyenne(cube_villes[cube_villes["ville"] == "Lyon"], "spécialité")
+    cube.groupby("ville")[["nb_notation", "nb_top"]].sum()
+
+
+def etape_carte(ctx):
+    from carte import donnees_carte
+
+    return donnees_carte(5)[1]
+
+
+def etape_chat_construction(ctx):
+    import chat
+
+    chat._moteur = None
+    ctx["moteur_chat"] = chat.moteur()
+
+
+def etape_chat(ctx):
+    ctx["moteur_chat"].repondre("Quel est le type de cuisine le plus courant à Lyon et à Aix-en-Provence ?")
+
+
+# Étapes dans l'ordre d'exécution : certaines utilisent le résultat des précédentes
+ETAPES = {
+    "import_app": etape_import_app,
+    "import_analyses": etape_import_analyses,
+    "vocabulaires": etape_vocabulaires,
+    "requete_filtree": etape_requete_filtree,
+    "chargement_objets": etape_chargement_objets,
+    "chargement_arrow": etape_chargement_arrow,
+    "candidats": etape_candidats,
+    "refiltrage": etape_refiltrage,
+    "voisins_construction": etape_voisins_construction,
+    "voisins": etape_voisins,
+    "noms_construction": etape_noms_construction,
+    "noms": etape_noms,
+    "noms_sql": etape_noms_sql,
+    "liste": etape_liste,
+    "analyses": etape_analyses,
+    "carte": etape_carte,
+    "chat_construction": etape_chat_construction,
+    "chat": etape_chat,
+    "rerun_app": etape_rerun_app,
+    "rerun_analyses": etape_rerun_analyses,
+}
+
+
+def _utiliser_base(chemin):
+    config.SOURCE = "locale"
+    config.CHEMIN_REPLIQUE = chemin
+    db.reconnecter()
+    db._versions.clear()
+
+
+def mesurer(fonction, ctx, repetitions):
+    # Un premier passage (imports, chargements paresseux) n'est pas compté
+    db.cache.vider()
+    fonction(ctx)
+    durees = []
+    for _ in range(repetitions):
+        # Chaque répétition repart d'un cache vide
+        db.cache.vider()
+        debut = time.perf_counter()
+        fonction(ctx)
+        durees.append((time.perf_counter() - debut) * 1000)
+    # tracemalloc ralentit l'exécution : la mémoire est mesurée à part
+    db.cache.vider()
+    tracemalloc.start()
+    resultat = fonction(ctx)
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    durees = np.array(durees)
+    mesures = {
+        "p50_ms": float(np.percentile(durees, 50)),
+        "p95_ms": float(np.percentile(durees, 95)),
+        "p99_ms": float(np.percentile(durees, 99)),
+        "max_ms": float(durees.max()),
+        "pic_python_mo": pic / 1024 / 1024,
+    }
+    if resultat is not None:
+        # Mémoire occupée par le résultat renvoyé par l'étape
+        mesures["resultat_mo"] = taille_estimee(resultat) / 1024 / 1024
+    return mesures
+
+
+def lancer(nom_taille, repetitions, etapes=None):
+    chemin = chemin_bench(nom_taille)
+    if not os.path.exists(chemin):
+        generer(taille(nom_taille), chemin)
+    _utiliser_base(chemin)
+    ctx = {}
+    resultats = {}
+    for nom, fonction in ETAPES.items():
+        if etapes and nom not in etapes:
+            continue
+        resultats[nom] = mesurer(fonction, ctx, repetitions)
+        print(
+            f"  {nom:<20} p50 {resultats[nom]['p50_ms']:9.2f} ms   p95 {resultats[nom]['p95_ms']:9.2f} ms"
+            f"   pic {resultats[nom]['pic_python_mo']:8.1f} Mo"
+        )
+    return {
+        "taille": nom_taille,
+        "lignes": taille(nom_taille),
+        "repetitions": repetitions,
+        "python": platform.python_version(),
+        # ru_maxrss est en Ko sous Linux
+        "pic_rss_mo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "etapes": resultats,
+    }
+
+
+def comparer(resultat, reference, tolerance):
+    """Étapes dont le p50 dépasse celui de la référence de plus de ``tolerance``."""
+    regressions = []
+    for nom, mesure in resultat["etapes"].items():
+        avant = reference["etapes"].get(nom)
+        if avant and mesure["p50_ms"] > avant["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{resultat['taille']} / {nom} : {avant['p50_ms']:.2f} → {mesure['p50_ms']:.2f} ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tailles", nargs="*", default=["10k", "100k"])
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--etapes", nargs="*", help="sous-ensemble d'étapes à mesurer")
+    parser.add_argument("--comparer", action="store_true", help="comparer aux résultats enregistrés")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    regressions = []
+    for nom_taille in args.tailles:
+        print(f"{nom_taille} :")
+        resultat = lancer(nom_taille, args.repetitions, args.etapes)
+        chemin = os.path.join(DOSSIER_RESULTATS, f"{nom_taille}.json")
+        if args.comparer and os.path.exists(chemin):
+            with open(chemin, encoding="utf-8") as f:
+                regressions += comparer(resultat, json.load(f), args.tolerance)
+        else:
+            with open(chemin, "w", encoding="utf-8") as f:
+                json.dump(resultat, f, indent=2, ensure_ascii=False)
+    for regression in regressions:
+        print(f"⚠️ régression : {regression}")
+    if regressions:
+        raise SystemExit(1)
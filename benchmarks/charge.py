@@ -0,0 +1,116 @@
+"""Test de charge du service JSON sur une base synthétique locale.
+
+Usage : python -m benchmarks.charge 100k [--clients 8] [--requetes 2000] [--threads 8]
+
+La base synthétique est générée si besoin, le service est démarré dans le
+processus sur un port libre, puis ``--clients`` clients envoient en
+parallèle des recherches tirées parmi ``--distinctes`` combinaisons de
+paramètres (positions autour des villes, spécialités, prix, rayons). Le
+débit, les percentiles de latence et la part de réponses servies par le
+cache sont affichés.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from benchmarks.bench import _utiliser_base
+from benchmarks.generateur import PRIX, SPECIALITES, VILLES, chemin_bench, generer, taille
+
+
+def combinaisons(nombre, graine=42):
+    """Chemins /recherche variés et reproductibles."""
+    aleatoire = random.Random(graine)
+    chemins = []
+    for _ in range(nombre):
+        params = {}
+        if aleatoire.random() < 0.8:
+            _, lat, lon, _ = aleatoire.choice(VILLES)
+            params["lat"] = f"{lat + aleatoire.uniform(-0.1, 0.1):.4f}"
+            params["lon"] = f"{lon + aleatoire.uniform(-0.1, 0.1):.4f}"
+            params["rayon"] = aleatoire.choice([2, 5, 10, 20, 50])
+        if aleatoire.random() < 0.5:
+            params["specialite"] = aleatoire.choice(SPECIALITES)
+        if aleatoire.random() < 0.3:
+            params["prix"] = aleatoire.choice(PRIX)
+        if aleatoire.random() < 0.5:
+            params["note_min"] = aleatoire.choice([4.0, 4.5])
+        chemins.append("/recherche?" + urllib.parse.urlencode(params))
+    return chemins
+
+
+def client(hote, port, chemins, latences, erreurs):
+    # Une connexion persistante par client : elle occupe un thread du
+    # service tant qu'elle est ouverte
+    connexion = http.client.HTTPConnection(hote, port, timeout=30)
+    for chemin in chemins:
+        debut = time.perf_counter()
+        try:
+            connexion.request("GET", chemin)
+            reponse = connexion.getresponse()
+            reponse.read()
+            if reponse.status != 200:
+                erreurs.append(reponse.status)
+        except (OSError, http.client.HTTPException) as erreur:
+            erreurs.append(repr(erreur))
+            connexion.close()
+            connexion = http.client.HTTPConnection(hote, port, timeout=30)
+        latences.append((time.perf_counter() - debut) * 1000)
+    connexion.close()
+
+
+def lancer(nom_taille, clients, requetes, threads, distinctes):
+    chemin = chemin_bench(nom_taille)
+    if not os.path.exists(chemin):
+        generer(taille(nom_taille), chemin)
+    _utiliser_base(chemin)
+
+    import service
+
+    service.cache_reponses.vider()
+    avant = service.cache_reponses.statistiques()
+    serveur = service.Serveur(("127.0.0.1", 0), threads)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    try:
+        tirages = random.Random(0)
+        chemins = combinaisons(distinctes)
+        lots = [[tirages.choice(chemins) for _ in range(requetes // clients)] for _ in range(clients)]
+        latences, erreurs = [], []
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            for lot in lots:
+                pool.submit(client, "127.0.0.1", serveur.server_port, lot, latences, erreurs)
+        duree = time.perf_counter() - debut
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
+
+    latences = np.array(latences)
+    stats = service.cache_reponses.statistiques()
+    print(
+        f"{nom_taille} : {len(latences)} requêtes en {duree:.2f} s ({len(latences) / duree:.0f} req/s), "
+        f"p50 {np.percentile(latences, 50):.1f} ms, p95 {np.percentile(latences, 95):.1f} ms, "
+        f"p99 {np.percentile(latences, 99):.1f} ms, erreurs {len(erreurs)}, "
+        f"cache {stats['hits'] - avant['hits']} hits / {stats['misses'] - avant['misses']} misses"
+    )
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tailles", nargs="*", default=["100k"])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requetes", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8, help="threads du service")
+    parser.add_argument("--distinctes", type=int, default=300, help="combinaisons de paramètres distinctes")
+    args = parser.parse_args()
+
+    succes = [lancer(t, args.clients, args.requetes, args.threads, args.distinctes) for t in args.tailles]
+    if not all(succes):
+        raise SystemExit(1)
@@ -0,0 +1,102 @@
+"""Génération de tables de restaurants synthétiques, reproductibles à partir d'une graine.
+
+Usage : python -m benchmarks.generateur 100k [--graine 42]
+
+Le fichier produit (donnees/bench_100k.duckdb) a le même schéma que les
+tables MotherDuck, est préparé comme elles et peut servir de réplique :
+MIAM_SOURCE=locale MIAM_REPLIQUE=donnees/bench_100k.duckdb streamlit run app.py
+"""
+import argparse
+import os
+
+import duckdb
+
+import config
+import preparation
+
+TAILLES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+# Villes et coordonnées de leur centre ; les restaurants sont dispersés autour
+VILLES = [
+    ("Paris", 48.8566, 2.3522, 30), ("Lyon", 45.7640, 4.8357, 10), ("Marseille", 43.2965, 5.3698, 10),
+    ("Avignon", 43.9493, 4.8055, 3), ("Bordeaux", 44.8378, -0.5792, 7), ("La Rochelle", 46.1603, -1.1511, 3),
+    ("Toulouse", 43.6047, 1.4442, 8), ("Toulon", 43.1242, 5.9280, 4), ("Aix en Provence", 43.5297, 5.4474, 4),
+    ("Brest", 48.3904, -4.4861, 3), ("Strasbourg", 48.5734, 7.7521, 6), ("Nantes", 47.2184, -1.5536, 6),
+    ("Lille", 50.6292, 3.0573, 6), ("Nice", 43.7102, 7.2620, 7), ("Montpellier", 43.6108, 3.8767, 5),
+    ("Rennes", 48.1173, -1.6778, 4), ("Grenoble", 45.1885, 5.7245, 4), ("Dijon", 47.3220, 5.0415, 3),
+]
+SPECIALITES = [
+    "Française", "Italienne", "Pizza", "Japonaise", "Sushi", "Chinoise", "Indienne", "Burger",
+    "Libanaise", "Marocaine", "Mexicaine", "Thaïlandaise", "Vietnamienne", "Crêperie", "Fruits de mer",
+    "Végétarienne", "Grecque", "Espagnole", "Coréenne", "Boulangerie",
+]
+PRIX = ["Bon marché", "Modéré", "Cher", "Très cher"]
+
+
+def taille(texte):
+    return TAILLES[texte] if texte in TAILLES else int(texte)
+
+
+def _uniforme(graine, i):
+    # Valeur pseudo-aléatoire dans [0, 1) déterministe, indépendante du parallélisme
+    return f"((hash(i, {graine}, {i}) % 1000003) / 1000003.0)"
+
+
+def requete_generation(n, graine=42):
+    """SQL produisant ``n`` restaurants synthétiques."""
+    poids = ", ".join(
+        f"{{'ville': '{v}', 'lat': {lat}, 'lon': {lon}}}"
+        for v, lat, lon, p in VILLES for _ in range(p)
+    )
+    specialites = ", ".join(f"'{s}'" for s in SPECIALITES)
+    # Les premiers prix sont les plus fréquents
+    prix = ", ".join(f"'{p}'" for p, poids_prix in zip(PRIX, [4, 4, 2, 1]) for _ in range(poids_prix))
+    u = lambda k: _uniforme(graine, k)
+    return f"""
+        WITH villes AS (SELECT [{poids}] AS liste),
+        tirages AS (
+            SELECT i, liste[1 + CAST(FLOOR({u(1)} * len(liste)) AS INTEGER)] AS v
+            FROM range({n}) r(i), villes
+        )
+        SELECT
+            v.ville AS ville,
+            ([{specialites}])[1 + CAST(FLOOR({u(2)} * {len(SPECIALITES)}) AS INTEGER)] AS "spécialité",
+            ([{prix}])[1 + CAST(FLOOR({u(3)} * 11) AS INTEGER)] AS "niveau de prix (libellé)",
+            CASE WHEN {u(4)} < 0.01 THEN NULL
+                 ELSE v.lat + ({u(5)} + {u(6)} + {u(7)} - 1.5) * 0.12 END AS latitude,
+            CASE WHEN {u(4)} < 0.01 THEN NULL
+                 ELSE v.lon + ({u(8)} + {u(9)} + {u(10)} - 1.5) * 0.16 END AS longitude,
+            'Restaurant ' || i AS nom,
+            ROUND(3 + 2 * SQRT({u(11)}), 1) AS notation
+        FROM tirages
+    """
+
+
+def generer(n, chemin, graine=42):
+    """Crée la base ``chemin`` avec les deux tables sources de ``n`` lignes, préparées."""
+    if os.path.dirname(chemin):
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    if os.path.exists(chemin):
+        os.remove(chemin)
+    con = duckdb.connect(chemin)
+    try:
+        con.execute(f"CREATE TABLE {config.TABLE_RESTAURANTS} AS {requete_generation(n, graine)}")
+        con.execute(f"CREATE TABLE {config.TABLE_ANALYSES} AS SELECT * FROM {config.TABLE_RESTAURANTS}")
+        # La préparation numérote aussi les tables dans _versions
+        preparation.preparer(con)
+    finally:
+        con.close()
+    return chemin
+
+
+def chemin_bench(nom_taille):
+    return os.path.join(config.DOSSIER_DONNEES, f"bench_{nom_taille}.duckdb")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tailles", nargs="+", help="10k, 100k, 1M, 10M ou un nombre de lignes")
+    parser.add_argument("--graine", type=int, default=42)
+    args = parser.parse_args()
+    for nom_taille in args.tailles:
+        print(f"→ {generer(taille(nom_taille), chemin_bench(nom_taille), args.graine)}")
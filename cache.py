@@ -0,0 +1,77 @@
+"""Cache mémoire des résultats de requêtes : durée de vie, éviction LRU et budget mémoire."""
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+
+def taille_estimee(valeur):
+    """Taille approximative (octets) d'un résultat de requête."""
+    if hasattr(valeur, "memory_usage"):
+        return int(valeur.memory_usage(index=True, deep=True).sum())
+    if hasattr(valeur, "nbytes"):
+        return int(valeur.nbytes)
+    if isinstance(valeur, (list, tuple)):
+        return sys.getsizeof(valeur) + sum(taille_estimee(v) for v in valeur)
+    return sys.getsizeof(valeur)
+
+
+class CacheTTL:
+    def __init__(self, duree_vie=600, budget_octets=256 * 1024 * 1024, max_entrees=1024):
+        self.duree_vie = duree_vie
+        self.budget_octets = budget_octets
+        self.max_entrees = max_entrees
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.octets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cle, defaut=None):
+        """Valeur associée à ``cle``, ou ``defaut`` si absente ou expirée."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None or time.monotonic() > entree[2]:
+                if entree is not None:
+                    self._retirer(cle)
+                self.misses += 1
+                return defaut
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return entree[0]
+
+    def put(self, cle, valeur, duree_vie=None, taille=None):
+        if taille is None:
+            taille = taille_estimee(valeur)
+        # Un résultat plus gros que le quart du budget n'est pas conservé
+        if taille > self.budget_octets // 4:
+            return
+        expiration = time.monotonic() + (duree_vie if duree_vie is not None else self.duree_vie)
+        with self._verrou:
+            if cle in self._entrees:
+                self._retirer(cle)
+            self._entrees[cle] = (valeur, taille, expiration)
+            self.octets += taille
+            while self._entrees and (self.octets > self.budget_octets or len(self._entrees) > self.max_entrees):
+                self._retirer(next(iter(self._entrees)))
+                self.evictions += 1
+
+    def _retirer(self, cle):
+        _, taille, _ = self._entrees.pop(cle)
+        self.octets -= taille
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self.octets = 0
+
+    def statistiques(self):
+        with self._verrou:
+            return {
+                "entrees": len(self._entrees),
+                "octets": self.octets,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,53 @@
+"""Ensemble de candidats d'une session, refiltré sans requête quand un curseur bouge.
+
+Les restaurants correspondant aux filtres catégoriels (spécialité, prix)
+dans le rayon maximal sont chargés une fois, triés par distance à la
+position de l'utilisateur. Un nouveau rayon se résout alors par recherche
+dichotomique dans les distances triées, et la note minimale par un masque
+sur ce préfixe.
+"""
+import numpy as np
+
+from distances import distances_km
+
+CLE_SESSION = "_candidats"
+
+
+class Candidats:
+    def __init__(self, data, user_coords):
+        distances = distances_km(
+            user_coords[0], user_coords[1],
+            data["latitude"].to_numpy(dtype="float64", na_value=np.nan),
+            data["longitude"].to_numpy(dtype="float64", na_value=np.nan),
+        )
+        # Tri stable ; les restaurants sans coordonnées (NaN) sont écartés
+        ordre = np.argsort(distances, kind="stable")
+        ordre = ordre[~np.isnan(distances[ordre])]
+        self.data = data.iloc[ordre].reset_index(drop=True)
+        self.data["distance_km"] = distances[ordre]
+        self.distances = distances[ordre]
+        self.notations = self.data["notation"].to_numpy(dtype="float64", na_value=np.nan)
+
+    def __len__(self):
+        return len(self.data)
+
+    def filtrer(self, rayon, note_min=None):
+        """Restaurants à moins de ``rayon`` km (et de note ≥ ``note_min``), du plus proche au plus loin."""
+        n = int(np.searchsorted(self.distances, rayon, side="right"))
+        if note_min is None:
+            return self.data.iloc[:n]
+        # Comparaison avec NaN fausse : les restaurants sans note sont exclus
+        return self.data.iloc[:n][self.notations[:n] >= note_min]
+
+
+def candidats_session(session_state, cle, charger, user_coords):
+    """Candidats de la session, reconstruits seulement si ``cle`` a changé.
+
+    ``cle`` réunit ce qui invalide l'ensemble (version de table, position,
+    filtres catégoriels) ; ``charger()`` renvoie le DataFrame à trier.
+    """
+    courant = session_state.get(CLE_SESSION)
+    if courant is None or courant[0] != cle:
+        courant = (cle, Candidats(charger(), user_coords))
+        session_state[CLE_SESSION] = courant
+    return courant[1]
@@ -0,0 +1,67 @@
+"""Préparation des données de la carte de la page Analyses, à taille bornée.
+
+Quand la zone affichée contient peu de restaurants, ils sont envoyés un par
+un ; sinon DuckDB les regroupe dans une grille dont le pas dépend du zoom
+(nombre de restaurants et note moyenne par case). Le pas est doublé tant
+que le nombre de marqueurs dépasse MAX_MARQUEURS.
+"""
+import config
+import db
+
+# En dessous de ce nombre de restaurants, les points sont affichés un par un
+SEUIL_POINTS = 2000
+# Plafond de marqueurs envoyés au navigateur par figure
+MAX_MARQUEURS = 3000
+# Une case de la grille fait 1/16 de tuile de carte au zoom demandé
+DIVISIONS_TUILE = 16
+
+
+def fenetre(centre, zoom):
+    """Boîte (lat_min, lat_max, lon_min, lon_max) visible autour de ``centre`` au ``zoom`` donné."""
+    demi_lon = 360 / 2 ** zoom * 1.5
+    demi_lat = demi_lon * 0.6
+    return centre[0] - demi_lat, centre[0] + demi_lat, centre[1] - demi_lon, centre[1] + demi_lon
+
+
+def centre_ville(ville):
+    ligne = db.requete(f"""
+        SELECT AVG(latitude), AVG(longitude)
+        FROM {config.TABLE_ANALYSES}
+        WHERE ville = ?
+    """, (ville,), mode="one")
+    return None if ligne is None or ligne[0] is None else (ligne[0], ligne[1])
+
+
+def donnees_carte(zoom, centre=None, note_min=4.5):
+    """("points", restaurants) ou ("groupes", cases agrégées) pour la zone demandée."""
+    conditions = "notation >= ? AND latitude IS NOT NULL AND longitude IS NOT NULL"
+    params = [note_min]
+    if centre is not None:
+        conditions += " AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+        params += list(fenetre(centre, zoom))
+
+    nombre = db.requete(f"SELECT COUNT(*) FROM {config.TABLE_ANALYSES} WHERE {conditions}", params, mode="one")[0]
+    if nombre <= SEUIL_POINTS:
+        return "points", db.requete(f"""
+            SELECT ville, "spécialité", latitude, longitude, nom, notation
+            FROM {config.TABLE_ANALYSES}
+            WHERE {conditions}
+        """, params, categories=("ville", "spécialité"))
+
+    pas = 360 / 2 ** zoom / DIVISIONS_TUILE
+    # Grille ancrée en (-90, -180) : à 360° de pas, une seule case reste
+    while True:
+        groupes = db.requete(f"""
+            SELECT
+                COUNT(*) AS nombre,
+                AVG(notation) AS notation,
+                AVG(latitude) AS latitude,
+                AVG(longitude) AS longitude,
+                mode(ville) AS ville
+            FROM {config.TABLE_ANALYSES}
+            WHERE {conditions}
+            GROUP BY FLOOR((latitude + 90) / {pas!r}), FLOOR((longitude + 180) / {pas!r})
+        """, params)
+        if len(groupes) <= MAX_MARQUEURS or pas >= 360:
+            return "groupes", groupes
+        pas *= 2
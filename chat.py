@@ -0,0 +1,171 @@
+"""Assistant de discussion : reconnaissance des villes et réponses précalculées.
+
+Les noms de villes, sans accents ni majuscules, sont compilés une fois par
+version de table dans un automate d'Aho-Corasick ; les statistiques de
+chaque ville sont calculées par une seule requête. Une question est ensuite
+traitée sans aucun aller-retour vers la base.
+"""
+from collections import deque
+import re
+import threading
+import unicodedata
+
+import config
+import db
+
+# Mots-clés (sans accents) de chaque type de question
+INTENTIONS = {
+    "note": ["note", "notation", "etoile", "avis", "mieux note"],
+    "prix": ["prix", "cher", "budget", "bon marche", "tarif"],
+    "nombre": ["combien", "nombre"],
+    "specialite": ["specialite", "cuisine", "type", "courant", "represente"],
+}
+
+
+def replier(texte):
+    """Minuscules, sans accents ; tirets et apostrophes deviennent des espaces."""
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    texte = re.sub(r"[-'’]", " ", texte)
+    return re.sub(r"\s+", " ", texte).strip()
+
+
+class Automate:
+    """Automate d'Aho-Corasick : toutes les occurrences de motifs en une passe."""
+
+    def __init__(self, motifs):
+        self.transitions = [{}]
+        self.echecs = [0]
+        self.sorties = [[]]
+        for motif, valeur in motifs.items():
+            etat = 0
+            for c in motif:
+                if c not in self.transitions[etat]:
+                    self.transitions.append({})
+                    self.echecs.append(0)
+                    self.sorties.append([])
+                    self.transitions[etat][c] = len(self.transitions) - 1
+                etat = self.transitions[etat][c]
+            self.sorties[etat].append((len(motif), valeur))
+
+        # Liens d'échec calculés en largeur
+        file = deque(self.transitions[0].values())
+        while file:
+            etat = file.popleft()
+            for c, suivant in self.transitions[etat].items():
+                file.append(suivant)
+                repli = self.echecs[etat]
+                while repli and c not in self.transitions[repli]:
+                    repli = self.echecs[repli]
+                self.echecs[suivant] = self.transitions[repli].get(c, 0)
+                self.sorties[suivant] = self.sorties[suivant] + self.sorties[self.echecs[suivant]]
+
+    def occurrences(self, texte):
+        """Liste de (début, fin, valeur) pour chaque motif trouvé dans ``texte``."""
+        resultats = []
+        etat = 0
+        for i, c in enumerate(texte):
+            while etat and c not in self.transitions[etat]:
+                etat = self.echecs[etat]
+            etat = self.transitions[etat].get(c, 0)
+            for longueur, valeur in self.sorties[etat]:
+                resultats.append((i + 1 - longueur, i + 1, valeur))
+        return resultats
+
+
+def _mot_entier(texte, debut, fin):
+    return (debut == 0 or not texte[debut - 1].isalnum()) and (fin == len(texte) or not texte[fin].isalnum())
+
+
+class MoteurChat:
+    def __init__(self, stats):
+        # stats : DataFrame (ville, spécialité, prix, nombre, somme_notation, nb_notation)
+        self.villes = {}
+        for cle, groupe in stats.groupby(stats["ville"].map(replier)):
+            if not cle:
+                continue
+            specialites = groupe.groupby("spécialité")["nombre"].sum().sort_values(ascending=False, kind="mergesort")
+            nb_notation = groupe["nb_notation"].sum()
+            self.villes[cle] = {
+                "ville": groupe["ville"].iloc[0],
+                "nombre": int(groupe["nombre"].sum()),
+                "top_specialite": specialites.index[0] if len(specialites) else None,
+                "nb_top_specialite": int(specialites.iloc[0]) if len(specialites) else 0,
+                "note_moyenne": groupe["somme_notation"].sum() / nb_notation if nb_notation else None,
+                "prix": groupe.groupby("prix")["nombre"].sum().sort_values(ascending=False, kind="mergesort").to_dict(),
+            }
+        self.automate = Automate({cle: cle for cle in self.villes})
+
+    def villes_mentionnees(self, prompt):
+        """Villes citées dans la question, dans l'ordre, sans chevauchement (la plus longue gagne)."""
+        texte = replier(prompt)
+        trouvees = [o for o in self.automate.occurrences(texte) if _mot_entier(texte, o[0], o[1])]
+        trouvees.sort(key=lambda o: (o[0], o[0] - o[1]))
+        villes, fin_precedente = [], 0
+        for debut, fin, cle in trouvees:
+            if debut >= fin_precedente and cle not in villes:
+                villes.append(cle)
+                fin_precedente = fin
+        return villes
+
+    @staticmethod
+    def intentions(prompt):
+        texte = replier(prompt)
+        trouvees = [nom for nom, mots in INTENTIONS.items() if any(re.search(rf"\b{mot}s?\b", texte) for mot in mots)]
+        return trouvees or ["specialite"]
+
+    def _reponse_ville(self, stats, intention):
+        ville = stats["ville"]
+        if intention == "nombre":
+            return f"🔢 La base compte **{stats['nombre']}** restaurants à {ville}."
+        if intention == "note":
+            if stats["note_moyenne"] is None:
+                return f"❌ Aucune note disponible pour la ville **{ville}**."
+            return f"⭐ À {ville}, la note moyenne des restaurants est de **{stats['note_moyenne']:.2f}**."
+        if intention == "prix":
+            repartition = ", ".join(f"{prix} : {n}" for prix, n in stats["prix"].items())
+            return f"💰 À {ville}, répartition des prix : {repartition}."
+        if stats["top_specialite"] is None:
+            return f"❌ Je n'ai trouvé aucune spécialité dans la base pour la ville **{ville}**."
+        return (
+            f"🍽️ À {ville}, la spécialité la plus représentée est : **{stats['top_specialite']}** "
+            f"avec {stats['nb_top_specialite']} restaurants."
+        )
+
+    def repondre(self, prompt):
+        villes = self.villes_mentionnees(prompt)
+        if not villes:
+            return "⚠️ Je n'ai pas détecté de ville dans votre question. Merci de mentionner une ville connue."
+        intentions = self.intentions(prompt)
+        return "\n\n".join(
+            self._reponse_ville(self.villes[cle], intention)
+            for cle in villes
+            for intention in intentions
+        )
+
+
+_verrou = threading.Lock()
+_moteur = None
+
+
+def moteur():
+    """Moteur de discussion de la version courante de la table des restaurants."""
+    global _moteur
+    version = db.version_table(config.TABLE_RESTAURANTS)
+    # Construit une seule fois, même appelé depuis plusieurs threads
+    with _verrou:
+        if _moteur is None or _moteur[0] != version:
+            stats = db.requete(f"""
+                SELECT
+                    ville,
+                    "spécialité",
+                    "niveau de prix (libellé)" AS prix,
+                    COUNT(*) AS nombre,
+                    SUM(notation) AS somme_notation,
+                    COUNT(notation) AS nb_notation
+                FROM {config.TABLE_RESTAURANTS}
+                WHERE ville IS NOT NULL
+                GROUP BY ALL
+            """)
+            _moteur = (version, MoteurChat(stats))
+        return _moteur[1]
@@ -0,0 +1,31 @@
+"""Paramètres communs à l'application et aux scripts."""
+from dotenv import load_dotenv
+import os
+
+# Chargement des variables d'environnement
+load_dotenv()
+
+TABLE_RESTAURANTS = "restaurants_france_specialtiescompletdef"
+TABLE_ANALYSES = "restaurants_france_cleaned"
+TABLE_CUBE = "agregats_restaurants"
+# Tables sources ; les tables dérivées sont reconstruites par preparation.py
+TABLES_SOURCES = [TABLE_RESTAURANTS, TABLE_ANALYSES]
+TABLES = TABLES_SOURCES + [TABLE_CUBE]
+
+# Source des données : "motherduck" (base distante) ou "locale" (réplique
+# synchronisée avec python replique.py)
+SOURCE = os.getenv("MIAM_SOURCE", "motherduck")
+DOSSIER_DONNEES = os.getenv("MIAM_DONNEES", "donnees")
+CHEMIN_REPLIQUE = os.getenv("MIAM_REPLIQUE", os.path.join(DOSSIER_DONNEES, "miam_guide.duckdb"))
+
+
+def chemin_motherduck():
+    token = os.getenv("mother_duck_token")
+    return f"md:my_db?motherduck_token={token}"
+
+
+def chemin_base():
+    if SOURCE == "locale":
+        # La réplique est un lien vers le fichier de la dernière synchronisation
+        return os.path.realpath(CHEMIN_REPLIQUE)
+    return chemin_motherduck()
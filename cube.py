@@ -0,0 +1,46 @@
+"""Cube d'agrégats de la page Analyses : une ligne par (ville, spécialité, prix).
+
+Construit au chargement par preparation.py ; toutes les statistiques de la
+page s'en déduisent sans relire la table des restaurants.
+"""
+import duckdb
+
+import config
+import db
+
+SQL_AGREGATS = f"""
+SELECT
+    ville,
+    "spécialité",
+    "niveau de prix (libellé)",
+    COUNT(*) AS nombre,
+    SUM(notation) AS somme_notation,
+    COUNT(notation) AS nb_notation,
+    COUNT(*) FILTER (WHERE notation >= 4.5) AS nb_top
+FROM {config.TABLE_ANALYSES}
+GROUP BY ville, "spécialité", "niveau de prix (libellé)"
+"""
+
+
+def construire_cube(con):
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {config.TABLE_CUBE} AS
+        {SQL_AGREGATS}
+        ORDER BY ville, "spécialité"
+    """)
+
+
+def charger_cube():
+    """Cube des agrégats (quelques Ko), recalculé à la volée s'il n'a pas été construit."""
+    try:
+        return db.requete(f"SELECT * FROM {config.TABLE_CUBE}")
+    except duckdb.CatalogException:
+        return db.requete(SQL_AGREGATS)
+
+
+def note_moyenne(cube, par):
+    """Note moyenne pondérée par groupe, à partir des sommes du cube."""
+    sommes = cube.groupby(par)[["somme_notation", "nb_notation"]].sum().reset_index()
+    sommes = sommes[sommes["nb_notation"] > 0]
+    sommes["notation"] = sommes["somme_notation"] / sommes["nb_notation"]
+    return sommes.drop(columns=["somme_notation", "nb_notation"])
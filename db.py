@@ -0,0 +1,233 @@
+"""Accès partagé à la base DuckDB / MotherDuck.
+
+Une seule connexion est ouverte par processus et réutilisée par toutes les
+pages et toutes les sessions Streamlit : la poignée de main avec MotherDuck
+n'est payée qu'une fois. Chaque thread (donc chaque exécution de script
+Streamlit) travaille sur son propre curseur, car un curseur DuckDB ne doit
+pas être partagé entre threads.
+"""
+import os
+import re
+import threading
+import time
+
+import duckdb
+
+from cache import CacheTTL, taille_estimee
+import config
+from instrumentation import span
+
+# Délai entre deux vérifications de l'état d'un curseur (secondes)
+INTERVALLE_VERIFICATION = 30
+# Durée de validité d'une version de table connue (secondes)
+DUREE_VERSION = 300
+# Numéros de version des tables, tenus par les scripts d'écriture
+TABLE_VERSIONS = "_versions"
+
+_verrou = threading.Lock()
+_connexion = None
+_chemin_ouvert = None
+_generation = 0
+_local = threading.local()
+_versions = {}
+_ABSENT = object()
+
+# Cache des résultats partagé par toutes les sessions
+cache = CacheTTL(
+    duree_vie=int(os.getenv("MIAM_CACHE_TTL", "600")),
+    budget_octets=int(os.getenv("MIAM_CACHE_MO", "256")) * 1024 * 1024,
+)
+
+
+def connexion():
+    """Connexion du processus, ouverte au premier appel."""
+    global _connexion, _chemin_ouvert
+    with _verrou:
+        if _connexion is None:
+            with span("connexion", source=config.SOURCE):
+                _chemin_ouvert = config.chemin_base()
+                _connexion = duckdb.connect(_chemin_ouvert, read_only=config.SOURCE == "locale")
+        return _connexion
+
+
+def reconnecter():
+    """Remplace la connexion courante ; la suivante sera ouverte à la demande.
+
+    L'ancienne connexion n'est pas fermée : les requêtes en cours sur ses
+    curseurs, dans d'autres threads, se terminent normalement. Chaque thread
+    passe à la nouvelle connexion à son prochain appel de curseur() et
+    l'ancienne base est libérée avec son dernier curseur.
+    """
+    global _connexion, _generation
+    with _verrou:
+        _connexion = None
+        _generation += 1
+
+
+def _en_bonne_sante(cur):
+    try:
+        cur.execute("SELECT 1").fetchone()
+        return True
+    except duckdb.Error:
+        return False
+
+
+def curseur():
+    """Curseur du thread courant, vérifié et recréé si besoin."""
+    cur = getattr(_local, "curseur", None)
+    if cur is not None and _local.generation != _generation:
+        cur = None
+    if cur is not None and time.monotonic() - _local.verifie_le > INTERVALLE_VERIFICATION:
+        if not _en_bonne_sante(cur):
+            reconnecter()
+            cur = None
+    if cur is None:
+        cur = connexion().cursor()
+        _local.curseur = cur
+        _local.generation = _generation
+    _local.verifie_le = time.monotonic()
+    return cur
+
+
+def executer(sql, params=()):
+    """Exécute une requête, avec une nouvelle tentative après reconnexion."""
+    try:
+        return curseur().execute(sql, params)
+    except (duckdb.ConnectionException, duckdb.IOException):
+        reconnecter()
+        return curseur().execute(sql, params)
+
+
+def empreinte(table_name, con=None):
+    """Empreinte du contenu d'une table, calculée côté base."""
+    # Nombre de lignes + somme des hachages de lignes : insensible à l'ordre,
+    # une seule ligne transférée.
+    cur = con if con is not None else curseur()
+    n, somme = cur.execute(f"SELECT COUNT(*), SUM(hash(t)) FROM {table_name} t").fetchone()
+    return f"{n}-{somme or 0}"
+
+
+def creer_table_versions(con, prefixe=""):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {prefixe}{TABLE_VERSIONS} (
+            table_name VARCHAR PRIMARY KEY,
+            empreinte VARCHAR,
+            version INTEGER,
+            synchronise_le TIMESTAMP
+        )
+    """)
+
+
+def version_enregistree(cur, table_name, prefixe=""):
+    """Numéro de la table dans _versions ("v3"), ou None si la base n'en tient pas."""
+    try:
+        ligne = cur.execute(f"SELECT version FROM {prefixe}{TABLE_VERSIONS} WHERE table_name = ?", (table_name,)).fetchone()
+    except duckdb.CatalogException:
+        return None
+    return f"v{ligne[0]}" if ligne else None
+
+
+def nouvelle_version(con, table_name):
+    """Incrémente la version de la table dans _versions, créée au besoin.
+
+    À appeler par tout script qui modifie une table, dans la même
+    transaction que l'écriture : c'est ce numéro que lisent l'application
+    et replique.py.
+    """
+    creer_table_versions(con)
+    con.execute(f"""
+        INSERT INTO {TABLE_VERSIONS} VALUES (?, NULL, 1, current_timestamp)
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = {TABLE_VERSIONS}.version + 1, empreinte = NULL, synchronise_le = EXCLUDED.synchronise_le
+    """, (table_name,))
+
+
+def _lire_version(table_name):
+    with span("version", table=table_name):
+        version = version_enregistree(curseur(), table_name)
+        # Base sans numéro de version : empreinte du contenu (parcours complet)
+        return version if version is not None else empreinte(table_name)
+
+
+def _suivre_replique():
+    # replique.py publie chaque synchronisation dans un nouveau fichier :
+    # on y passe sans redémarrer, la réplique précédente reste lisible
+    # par les requêtes en cours
+    if config.SOURCE == "locale" and _connexion is not None and config.chemin_base() != _chemin_ouvert:
+        reconnecter()
+        _versions.clear()
+
+
+def version_table(table_name):
+    """Version courante d'une table, mise en cache DUREE_VERSION secondes."""
+    connue = _versions.get(table_name)
+    if connue is None or time.monotonic() - connue[1] > DUREE_VERSION:
+        _suivre_replique()
+        connue = (_lire_version(table_name), time.monotonic())
+        _versions[table_name] = connue
+    return connue[0]
+
+
+def _normaliser(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def en_dataframe(res, categories=()):
+    """DataFrame d'un résultat DuckDB, via Arrow quand pyarrow est installé.
+
+    Les colonnes de ``categories`` deviennent des catégories pandas (codes
+    entiers + dictionnaire), les autres textes restent en mémoire Arrow et
+    les colonnes numériques sont reprises sans copie quand c'est possible.
+    """
+    try:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        df = res.fetchdf()
+        for colonne in categories:
+            if colonne in df.columns:
+                df[colonne] = df[colonne].astype("category")
+        return df
+
+    table = res.to_arrow_table() if hasattr(res, "to_arrow_table") else res.fetch_arrow_table()
+    for colonne in categories:
+        if colonne in table.column_names:
+            i = table.column_names.index(colonne)
+            table = table.set_column(i, colonne, pc.dictionary_encode(table.column(i)))
+    textes = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+    return table.to_pandas(split_blocks=True, types_mapper=textes.get)
+
+
+def requete(sql, params=(), mode="df", categories=()):
+    """Résultat d'une requête de lecture, servi depuis le cache si possible.
+
+    ``mode`` vaut "df" (DataFrame), "all" (liste de tuples) ou "one" ;
+    ``categories`` liste les colonnes à renvoyer en catégories (mode "df").
+    La clé contient la version des tables interrogées : une nouvelle
+    version rend les anciens résultats inaccessibles.
+    """
+    sql = _normaliser(sql)
+    versions = tuple(version_table(t) for t in config.TABLES if t in sql)
+    cle = (versions, sql, tuple(params), mode, tuple(categories))
+    with span("requete", sql=sql[:80]) as mesure:
+        resultat = cache.get(cle, _ABSENT)
+        mesure["cache"] = resultat is not _ABSENT
+        if resultat is _ABSENT:
+            res = executer(sql, params)
+            if mode == "df":
+                resultat = en_dataframe(res, categories)
+            elif mode == "one":
+                resultat = res.fetchone()
+            else:
+                resultat = res.fetchall()
+            taille = taille_estimee(resultat)
+            mesure["octets"] = taille
+            cache.put(cle, resultat, taille=taille)
+        mesure["lignes"] = len(resultat) if mode != "one" else int(resultat is not None)
+    # Copie superficielle : un appelant qui ajoute une colonne ne modifie pas le cache
+    if mode == "df":
+        return resultat.copy(deep=False)
+    if mode == "all":
+        return list(resultat)
+    return resultat
@@ -0,0 +1,91 @@
+"""Lancement en parallèle des attentes indépendantes du premier affichage.
+
+Connexion et vocabulaires des filtres, géocodage inverse et préchauffage
+du moteur de chat ne dépendent pas les uns des autres : ils partent dans
+un pool de threads partagé par les sessions, et la page n'attend chaque
+résultat que lorsqu'elle en a besoin, au plus ``delai`` secondes. Passé ce
+délai, la page continue avec une valeur de repli ; la tâche se termine en
+arrière-plan et remplit ses caches pour l'exécution suivante. Les
+préchauffages de caches partagés ne partent qu'une fois par processus.
+
+Les appels Streamlit (dont st_javascript) restent dans le thread principal.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import logging
+import os
+import threading
+
+from instrumentation import attacher, rerun_courant, span
+
+NB_THREADS = int(os.getenv("MIAM_THREADS_DEMARRAGE", "4"))
+
+_pool = ThreadPoolExecutor(max_workers=NB_THREADS, thread_name_prefix="miam-demarrage")
+_journal = logging.getLogger("miam.demarrage")
+_verrou = threading.Lock()
+_prechauffages = {}
+
+
+def prechauffer(nom, fonction, *args):
+    """Lance ``fonction`` dans le pool une seule fois par processus.
+
+    Pour les caches partagés par toutes les sessions (moteur du chat...) :
+    les exécutions suivantes de la page ne soumettent rien. Un échec est
+    journalisé et la tâche sera relancée au prochain appel.
+    """
+    with _verrou:
+        if nom not in _prechauffages:
+            tache = _pool.submit(fonction, *args)
+            _prechauffages[nom] = tache
+            tache.add_done_callback(lambda t: _oublier_echec(nom, t))
+        return _prechauffages[nom]
+
+
+def _oublier_echec(nom, tache):
+    if tache.exception() is not None:
+        _journal.error("préchauffage %s", nom, exc_info=tache.exception())
+        with _verrou:
+            _prechauffages.pop(nom, None)
+
+
+class Demarrage:
+    """Tâches lancées pendant une exécution de page, récupérées par leur nom."""
+
+    def __init__(self):
+        self._taches = {}
+        self._rerun = rerun_courant()
+
+    def lancer(self, nom, fonction, *args, **kwargs):
+        """Démarre ``fonction`` dans le pool, sauf si une tâche ``nom`` existe déjà."""
+        if nom not in self._taches:
+            self._taches[nom] = _pool.submit(self._executer, nom, fonction, args, kwargs)
+        return self._taches[nom]
+
+    def _executer(self, nom, fonction, args, kwargs):
+        # Les spans du thread de travail rejoignent ceux de l'exécution de page
+        attacher(self._rerun)
+        try:
+            with span(nom):
+                return fonction(*args, **kwargs)
+        finally:
+            # Le thread du pool resservira à d'autres sessions et préchauffages
+            attacher(None)
+
+    def resultat(self, nom, delai, defaut=None, facultatif=False):
+        """Résultat de la tâche ``nom``, ou ``defaut`` si elle dépasse ``delai`` s.
+
+        Une erreur de la tâche (table absente, identifiants refusés...) est
+        journalisée puis relevée dans le thread de la page ; pour une tâche
+        ``facultatif`` (géocodage...), ``defaut`` est renvoyé à la place.
+        """
+        with span(f"attente_{nom}") as attributs:
+            try:
+                return self._taches[nom].result(timeout=delai)
+            except TimeoutError:
+                attributs["expire"] = True
+                return defaut
+            except Exception as erreur:
+                attributs["erreur"] = repr(erreur)
+                _journal.error("tâche %s", nom, exc_info=erreur)
+                if facultatif:
+                    return defaut
+                raise
@@ -0,0 +1,65 @@
+"""Calcul vectorisé des distances entre l'utilisateur et les restaurants."""
+import numpy as np
+
+# Ellipsoïde WGS84 (le même que geopy.distance.geodesic)
+RAYON_EQUATORIAL_KM = 6378.137
+APLATISSEMENT = 1 / 298.257223563
+RAYON_MOYEN_KM = 6371.0088
+# Écart maximal entre distance sur l'ellipsoïde et sur la sphère moyenne
+MARGE_ELLIPSOIDE = 1.01
+
+
+def _angle_central(lat1, lon1, lat2, lon2):
+    # Formule de haversine, en radians
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    """Distance sphérique (km) entre un point et des tableaux de coordonnées."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2 = np.radians(np.asarray(latitudes, dtype="float64"))
+    lon2 = np.radians(np.asarray(longitudes, dtype="float64"))
+    return RAYON_MOYEN_KM * _angle_central(lat1, lon1, lat2, lon2)
+
+
+def distances_km(lat, lon, latitudes, longitudes, ellipsoide=True):
+    """Distances (km) vers chaque restaurant, NaN pour les coordonnées manquantes.
+
+    Avec ``ellipsoide=True`` on applique la correction de Lambert sur
+    l'ellipsoïde WGS84 : l'écart avec geopy reste de l'ordre de quelques
+    mètres sur les distances qui nous intéressent.
+    """
+    latitudes = np.asarray(latitudes, dtype="float64")
+    longitudes = np.asarray(longitudes, dtype="float64")
+    if not ellipsoide:
+        return haversine_km(lat, lon, latitudes, longitudes)
+
+    f = APLATISSEMENT
+    # Latitudes réduites
+    beta1 = np.arctan((1 - f) * np.tan(np.radians(lat)))
+    beta2 = np.arctan((1 - f) * np.tan(np.radians(latitudes)))
+    lon1, lon2 = np.radians(lon), np.radians(longitudes)
+    sigma = _angle_central(beta1, lon1, beta2, lon2)
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+    # Points confondus : la correction n'a pas de sens, la distance est nulle
+    correction = np.where(sigma > 0, x + y, 0.0)
+    return RAYON_EQUATORIAL_KM * (sigma - f / 2 * correction)
+
+
+def boite_englobante(lat, lon, rayon):
+    """Boîte (lat_min, lat_max, lon_min, lon_max) contenant le cercle de ``rayon`` km."""
+    # Marge pour couvrir l'écart entre sphère et ellipsoïde
+    delta_lat = np.degrees(rayon * MARGE_ELLIPSOIDE / RAYON_MOYEN_KM)
+    lat_min, lat_max = lat - delta_lat, lat + delta_lat
+    if lat_min <= -90 or lat_max >= 90:
+        return float(max(lat_min, -90.0)), float(min(lat_max, 90.0)), -180.0, 180.0
+    delta_lon = delta_lat / np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+    return float(lat_min), float(lat_max), float(max(lon - delta_lon, -180.0)), float(min(lon + delta_lon, 180.0))
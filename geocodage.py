@@ -0,0 +1,184 @@
+"""Géocodage inverse local : ville connue la plus proche d'une position.
+
+Les villes et leurs coordonnées viennent de la table des restaurants (centre
+des restaurants de chaque ville), indexées sur une grille. Les réponses sont
+conservées sur disque par coordonnées arrondies, dans un journal où chaque
+nouvelle réponse ajoute une ligne. Nominatim n'est interrogé que si
+MIAM_NOMINATIM=1 et qu'aucune ville connue n'est assez proche ; ses erreurs
+ne sont pas mises en cache.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+import config
+import db
+from distances import haversine_km
+
+# Au-delà de cette distance, la ville la plus proche n'est pas retenue
+DISTANCE_MAX_KM = 20
+# Taille des cellules de l'index des villes (degrés)
+PAS_INDEX = 0.5
+# Arrondi des coordonnées dans le cache (~100 m)
+DECIMALES_CACHE = 3
+MAX_ENTREES_CACHE = 10000
+# Journal JSONL : une ligne [clé, ville] ajoutée par réponse
+CHEMIN_CACHE = os.path.join(config.DOSSIER_DONNEES, "geocodage_cache.jsonl")
+# Délai avant de réinterroger Nominatim après une erreur (secondes)
+DUREE_ECHEC = 300
+NOMINATIM = os.getenv("MIAM_NOMINATIM") == "1"
+
+_verrou = threading.Lock()
+_verrou_index = threading.Lock()
+_index = None
+_cache = None
+_lignes_journal = 0
+# Dernier échec de Nominatim par clé, gardé en mémoire seulement
+_echecs = {}
+
+
+class IndexVilles:
+    def __init__(self, villes, latitudes, longitudes):
+        self.villes = list(villes)
+        self.latitudes = np.asarray(latitudes, dtype="float64")
+        self.longitudes = np.asarray(longitudes, dtype="float64")
+        self.cellules = {}
+        for i, (lat, lon) in enumerate(zip(self.latitudes, self.longitudes)):
+            self.cellules.setdefault(self._cellule(lat, lon), []).append(i)
+        self.rayon_max = 0
+        if self.cellules:
+            lignes = [c[0] for c in self.cellules]
+            colonnes = [c[1] for c in self.cellules]
+            self.rayon_max = max(max(lignes) - min(lignes), max(colonnes) - min(colonnes)) + 1
+
+    @staticmethod
+    def _cellule(lat, lon):
+        return int(math.floor(lat / PAS_INDEX)), int(math.floor(lon / PAS_INDEX))
+
+    def _anneau(self, ligne, colonne, r):
+        for i in range(ligne - r, ligne + r + 1):
+            for j in range(colonne - r, colonne + r + 1):
+                if max(abs(i - ligne), abs(j - colonne)) == r:
+                    yield from self.cellules.get((i, j), ())
+
+    def plus_proche(self, lat, lon):
+        """(ville, distance_km) la plus proche, ou (None, None) si l'index est vide."""
+        ligne, colonne = self._cellule(lat, lon)
+        candidats = []
+        r = 0
+        # Premier anneau de cellules non vide, plus l'anneau suivant pour ne pas
+        # manquer une ville juste de l'autre côté d'un bord de cellule
+        while r <= self.rayon_max and not candidats:
+            candidats.extend(self._anneau(ligne, colonne, r))
+            r += 1
+        if not candidats:
+            return None, None
+        candidats.extend(self._anneau(ligne, colonne, r))
+        candidats = np.array(candidats)
+        d = haversine_km(lat, lon, self.latitudes[candidats], self.longitudes[candidats])
+        meilleur = int(np.argmin(d))
+        return self.villes[candidats[meilleur]], float(d[meilleur])
+
+
+def index_villes():
+    """Index des villes de la table des restaurants, reconstruit à chaque nouvelle version."""
+    global _index
+    version = db.version_table(config.TABLE_RESTAURANTS)
+    # Géocodages lancés en parallèle par plusieurs sessions : une seule construction
+    with _verrou_index:
+        if _index is None or _index[0] != version:
+            centres = db.requete(f"""
+                SELECT ville, AVG(latitude) AS latitude, AVG(longitude) AS longitude
+                FROM {config.TABLE_RESTAURANTS}
+                WHERE ville IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+                GROUP BY ville
+            """)
+            _index = (version, IndexVilles(centres["ville"], centres["latitude"], centres["longitude"]))
+        return _index[1]
+
+
+def _charger_cache():
+    global _cache, _lignes_journal
+    if _cache is None:
+        _cache, _lignes_journal = {}, 0
+        try:
+            with open(CHEMIN_CACHE, encoding="utf-8") as f:
+                for ligne in f:
+                    try:
+                        cle, ville = json.loads(ligne)
+                    except ValueError:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        continue
+                    # La dernière réponse écrite pour une clé l'emporte
+                    _cache.pop(cle, None)
+                    _cache[cle] = ville
+                    _lignes_journal += 1
+        except OSError:
+            pass
+    return _cache
+
+
+def _ajouter_au_cache(cle, ville):
+    global _lignes_journal
+    _cache[cle] = ville
+    # Les entrées les plus anciennes partent en premier
+    for ancienne in list(_cache)[:max(0, len(_cache) - MAX_ENTREES_CACHE)]:
+        del _cache[ancienne]
+    os.makedirs(os.path.dirname(CHEMIN_CACHE) or ".", exist_ok=True)
+    if _lignes_journal >= 2 * MAX_ENTREES_CACHE:
+        # Journal compacté de temps en temps : une ligne par entrée vivante
+        temporaire = f"{CHEMIN_CACHE}.{os.getpid()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps([c, v], ensure_ascii=False) + "\n" for c, v in _cache.items())
+        os.replace(temporaire, CHEMIN_CACHE)
+        _lignes_journal = len(_cache)
+    else:
+        # Une ligne ajoutée par réponse, sans réécrire le fichier
+        with open(CHEMIN_CACHE, "a", encoding="utf-8") as f:
+            f.write(json.dumps([cle, ville], ensure_ascii=False) + "\n")
+        _lignes_journal += 1
+
+
+def _nominatim(lat, lon):
+    """(ville ou None, réponse obtenue) ; une erreur ou un délai dépassé n'est pas une réponse."""
+    from geopy.geocoders import Nominatim
+
+    try:
+        location = Nominatim(user_agent="miam_guide_app").reverse((lat, lon), language="fr", timeout=2)
+    except Exception:
+        return None, False
+    if location and "address" in location.raw:
+        adresse = location.raw["address"]
+        return adresse.get("city") or adresse.get("town") or adresse.get("village") or adresse.get("municipality"), True
+    return None, True
+
+
+def ville_proche(lat, lon):
+    """Nom de la ville correspondant à la position, ou None si inconnue."""
+    version = db.version_table(config.TABLE_RESTAURANTS)
+    cle = f"{version}|{round(lat, DECIMALES_CACHE)},{round(lon, DECIMALES_CACHE)}"
+    with _verrou:
+        cache = _charger_cache()
+        if cle in cache:
+            return cache[cle]
+        echec = _echecs.get(cle)
+        if echec is not None and time.monotonic() - echec < DUREE_ECHEC:
+            return None
+
+    ville, distance = index_villes().plus_proche(lat, lon)
+    reponse = True
+    if ville is None or distance > DISTANCE_MAX_KM:
+        ville, reponse = _nominatim(lat, lon) if NOMINATIM else (None, True)
+
+    with _verrou:
+        if reponse:
+            _echecs.pop(cle, None)
+            _ajouter_au_cache(cle, ville)
+        else:
+            # Nominatim indisponible : nouvel essai après DUREE_ECHEC, rien sur disque
+            _echecs[cle] = time.monotonic()
+    return ville
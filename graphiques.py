@@ -0,0 +1,230 @@
+"""Figures de la page Analyses, construites à la demande et mises en cache.
+
+Chaque figure est calculée à sa première demande, puis gardée tant que les
+tables analysées gardent la même version. Plotly Express
+(plusieurs centaines de ms d'import) n'est chargé qu'à la première figure
+construite, pas au démarrage de la page.
+"""
+import functools
+
+import duckdb
+
+from cache import CacheTTL
+from carte import centre_ville, donnees_carte
+import config
+from cube import charger_cube, note_moyenne
+import db
+
+VILLES = [
+    "Paris", "Lyon", "Marseille", "Avignon", "Bordeaux",
+    "La Rochelle", "Toulouse", "Toulon", "Aix en Provence",
+    "Brest", "Strasbourg"
+]
+# Tables dont dépendent les figures : une nouvelle version les invalide
+TABLES = (config.TABLE_ANALYSES, config.TABLE_CUBE)
+
+_ABSENT = object()
+
+# Figures partagées par toutes les sessions (quelques centaines de Ko
+# chacune), comptées en entrées : mesurer une figure coûte autant que la construire
+cache_figures = CacheTTL(duree_vie=3600, max_entrees=64)
+
+
+def _version(table_name):
+    try:
+        return db.version_table(table_name)
+    except duckdb.CatalogException:
+        # Cube pas encore construit : les figures sont calculées à partir de
+        # TABLE_ANALYSES (voir charger_cube), dont la version est dans la clé
+        return None
+
+
+def par_version(fonction):
+    """Met en cache le résultat de ``fonction`` pour la version courante des tables."""
+    @functools.wraps(fonction)
+    def enveloppe(*args):
+        cle = (tuple(_version(t) for t in TABLES), fonction.__name__, args)
+        figure = cache_figures.get(cle, _ABSENT)
+        if figure is _ABSENT:
+            figure = fonction(*args)
+            cache_figures.put(cle, figure, taille=0)
+        return figure
+    return enveloppe
+
+
+def _cube_villes():
+    cube = charger_cube()
+    cube_clean = cube.dropna(subset=['spécialité', 'ville'])
+    return cube_clean[cube_clean['ville'].isin(VILLES)]
+
+
+def _notes_top_specialites():
+    """Note moyenne par ville et spécialité, pour les 5 spécialités les plus fréquentes."""
+    cube_villes = _cube_villes()
+    spec_totals = cube_villes.groupby('spécialité')['nombre'].sum().sort_values(ascending=False)
+    top_specs = spec_totals.head(5).index.tolist()
+    return note_moyenne(cube_villes[cube_villes['spécialité'].isin(top_specs)], ['ville', 'spécialité'])
+
+
+@par_version
+def figure_carte(zone):
+    """Carte des restaurants notés 4.5 ou plus sur la France ou une ville, ou None si vide."""
+    import plotly.express as px
+
+    centre = None if zone is None else centre_ville(zone)
+    zoom = 5 if centre is None else 11
+    # Points individuels si la zone en compte peu, sinon cases agrégées dans DuckDB
+    type_carte, restos_top_notes = donnees_carte(zoom, centre)
+    if restos_top_notes.empty:
+        return None
+    if type_carte == "points":
+        map_fig = px.scatter_mapbox(
+            restos_top_notes,
+            lat="latitude",
+            lon="longitude",
+            color="notation",
+            size_max=10,
+            zoom=zoom,
+            hover_name="nom",
+            hover_data={
+                "ville": True,
+                "spécialité": True,
+                "notation": ':.2f',
+                "latitude": False,
+                "longitude": False
+            },
+            color_continuous_scale="YlOrRd",
+            title="📍 Localisation des restaurants avec note ≥ 4.5"
+        )
+    else:
+        map_fig = px.scatter_mapbox(
+            restos_top_notes,
+            lat="latitude",
+            lon="longitude",
+            color="notation",
+            size="nombre",
+            size_max=30,
+            zoom=zoom,
+            hover_name="ville",
+            hover_data={
+                "nombre": True,
+                "notation": ':.2f',
+                "latitude": False,
+                "longitude": False
+            },
+            labels={'nombre': 'Restaurants', 'notation': 'Note moyenne'},
+            color_continuous_scale="YlOrRd",
+            title="📍 Restaurants avec note ≥ 4.5 (regroupés par zone)"
+        )
+    map_fig.update_layout(mapbox_style="open-street-map", height=600)
+    map_fig.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
+    return map_fig
+
+
+@par_version
+def figure_meilleure_specialite():
+    import plotly.express as px
+
+    # Spécialité avec la meilleure note moyenne par ville
+    grouped = _notes_top_specialites()
+    idx = grouped.groupby('ville')['notation'].idxmax()
+    best_specialities = grouped.loc[idx].sort_values(by='notation', ascending=False)
+
+    fig_best_spec = px.bar(
+        best_specialities,
+        x='ville',
+        y='notation',
+        color='spécialité',
+        title="🏅 Meilleure spécialité par ville (en fonction de la note moyenne)",
+        labels={'notation': 'Note moyenne', 'ville': 'Ville', 'spécialité': 'Spécialité'},
+        text=best_specialities['notation'].apply(lambda x: f"{x:.2f}")
+    )
+    fig_best_spec.update_traces(textposition='outside')
+    fig_best_spec.update_layout(barmode='group')
+    return fig_best_spec
+
+
+@par_version
+def figure_heatmap():
+    import plotly.express as px
+
+    heatmap_df = _notes_top_specialites().pivot(index="ville", columns="spécialité", values="notation").round(2)
+    return px.imshow(
+        heatmap_df,
+        text_auto=True,
+        color_continuous_scale='YlOrRd',
+        labels=dict(x="Spécialité", y="Ville", color="Note moyenne"),
+        aspect="auto",
+        title="💡 Heatmap des notes moyennes par spécialité et par ville"
+    )
+
+
+@par_version
+def figure_bon_marche():
+    """Top 10 des villes par nombre de restaurants Bon marché, ou None si aucun."""
+    import plotly.express as px
+
+    cube = charger_cube()
+    bon_marche_df = (
+        cube[cube['niveau de prix (libellé)'] == 'Bon marché']
+        .groupby('ville', dropna=False)['nombre'].sum()
+        .reset_index(name='nombre_restaurants')
+        .sort_values(by='nombre_restaurants', ascending=False)
+        .head(10)
+    )
+    if bon_marche_df.empty:
+        return None
+    return px.bar(
+        bon_marche_df,
+        x='ville',
+        y='nombre_restaurants',
+        color_discrete_sequence=['orange'],
+        labels={'ville': 'Ville', 'nombre_restaurants': 'Nombre de restaurants'},
+        title="Nombre de restaurants Bon marché par ville"
+    )
+
+
+@par_version
+def figure_ville(ville):
+    import plotly.express as px
+
+    cube = charger_cube()
+    note_par_spec_ville = (
+        note_moyenne(cube[cube['ville'] == ville].dropna(subset=['spécialité']), 'spécialité')
+        .sort_values(by='notation', ascending=False)
+    )
+    return px.bar(
+        note_par_spec_ville,
+        x='spécialité',
+        y='notation',
+        color_discrete_sequence=['yellow'],
+        labels={'notation': 'Note moyenne'},
+        title=f"Note moyenne par spécialité - {ville}"
+    )
+
+
+@par_version
+def figure_pourcentage():
+    import plotly.express as px
+
+    cube = charger_cube()
+    cube_noted = cube[cube['ville'].isin(VILLES)]
+
+    # Total noté et bien notés par ville
+    total_par_ville = cube_noted.groupby('ville')['nb_notation'].sum()
+    bien_notes_par_ville = cube_noted.groupby('ville')['nb_top'].sum()
+
+    total_par_ville = total_par_ville[total_par_ville > 0]
+    pourcentage_bien_notes = (bien_notes_par_ville[total_par_ville.index] / total_par_ville * 100).reset_index(name='pourcentage')
+    pourcentage_bien_notes = pourcentage_bien_notes.sort_values(by='pourcentage', ascending=False)
+
+    fig_pourcentage = px.bar(
+        pourcentage_bien_notes,
+        x='ville',
+        y='pourcentage',
+        color_discrete_sequence=['#2ca02c'],
+        labels={'pourcentage': '% Restaurants ≥ 4.5'},
+        title="🥇 Pourcentage de restaurants très bien notés (≥ 4.5) par ville"
+    )
+    fig_pourcentage.update_traces(text=pourcentage_bien_notes['pourcentage'].apply(lambda x: f"{x:.1f}%"), textposition='outside')
+    return fig_pourcentage
@@ -0,0 +1,64 @@
+"""Découpage de la carte en cellules régulières pour le filtrage spatial."""
+import math
+
+import numpy as np
+
+# Taille d'une cellule en degrés (~11 km en latitude)
+PAS_CELLULE = 0.1
+NB_COLONNES = int(360 / PAS_CELLULE)
+COLONNE_CELLULE = "cellule_geo"
+
+
+def _ligne(lat):
+    return int(math.floor((lat + 90) / PAS_CELLULE))
+
+
+def _colonne(lon):
+    return min(int(math.floor((lon + 180) / PAS_CELLULE)), NB_COLONNES - 1)
+
+
+def cellule(lat, lon):
+    """Identifiant de la cellule contenant le point (lat, lon)."""
+    return _ligne(lat) * NB_COLONNES + _colonne(lon)
+
+
+def cellules(latitudes, longitudes):
+    """cellule() pour des tableaux de coordonnées ; NaN quand elles manquent."""
+    lignes = np.floor((np.asarray(latitudes, dtype="float64") + 90) / PAS_CELLULE)
+    colonnes = np.minimum(np.floor((np.asarray(longitudes, dtype="float64") + 180) / PAS_CELLULE), NB_COLONNES - 1)
+    return lignes * NB_COLONNES + colonnes
+
+
+def expression_sql_cellule(col_lat="latitude", col_lon="longitude"):
+    # Même calcul que cellule(), exécuté par DuckDB au chargement
+    return (
+        f"CAST(FLOOR(({col_lat} + 90) / {PAS_CELLULE}) AS BIGINT) * {NB_COLONNES}"
+        f" + LEAST(CAST(FLOOR(({col_lon} + 180) / {PAS_CELLULE}) AS BIGINT), {NB_COLONNES - 1})"
+    )
+
+
+def plages_cellules(lat_min, lat_max, lon_min, lon_max):
+    """Plages (début, fin) d'identifiants couvrant la boîte, une par ligne de la grille."""
+    col_min, col_max = _colonne(lon_min), _colonne(lon_max)
+    return [
+        (ligne * NB_COLONNES + col_min, ligne * NB_COLONNES + col_max)
+        for ligne in range(_ligne(lat_min), _ligne(lat_max) + 1)
+    ]
+
+
+def filtre_sql_boite(lat_min, lat_max, lon_min, lon_max):
+    """Clause SQL et paramètres restreignant une requête à la boîte englobante.
+
+    La boîte est élargie aux bords des cellules : deux positions voisines
+    produisent la même requête.
+    """
+    plages = plages_cellules(lat_min, lat_max, lon_min, lon_max)
+    lat_min = max(round(math.floor(lat_min / PAS_CELLULE) * PAS_CELLULE, 6), -90.0)
+    lat_max = min(round(math.ceil(lat_max / PAS_CELLULE) * PAS_CELLULE, 6), 90.0)
+    lon_min = max(round(math.floor(lon_min / PAS_CELLULE) * PAS_CELLULE, 6), -180.0)
+    lon_max = min(round(math.ceil(lon_max / PAS_CELLULE) * PAS_CELLULE, 6), 180.0)
+    clause = " OR ".join(f"{COLONNE_CELLULE} BETWEEN ? AND ?" for _ in plages)
+    params = [borne for plage in plages for borne in plage]
+    clause = f"({clause}) AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+    params += [lat_min, lat_max, lon_min, lon_max]
+    return clause, params
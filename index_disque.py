@@ -0,0 +1,117 @@
+"""Index construits par version de table, enregistrés sur disque et rouverts en mémoire mappée.
+
+Chaque index occupe un dossier <racine>/<table>_<version>/ : un fichier
+.npy par tableau numpy (rouvert avec np.load(mmap_mode="r")), les lignes
+renvoyées par les recherches en parquet et des métadonnées JSON. Il est
+construit à la première demande pour une version donnée, puis rouvert
+tel quel aux démarrages suivants ; les dossiers des versions précédentes
+sont supprimés. Utilisé par noms.py et voisins.py.
+"""
+import json
+import os
+import shutil
+import threading
+
+import duckdb
+import numpy as np
+
+import db
+
+# Colonnes des lignes de résultat, dans l'ordre des tableaux de l'index
+COLONNES_LIGNES = ["ville", "spécialité", "niveau de prix (libellé)", "latitude", "longitude", "nom", "notation"]
+CATEGORIES = ("ville", "spécialité", "niveau de prix (libellé)")
+FICHIER_LIGNES = "lignes.parquet"
+# Écrit en dernier : un dossier sans ce fichier est incomplet ou d'un ancien format
+FICHIER_META = "meta.json"
+
+
+def dossier_version(racine, table_name, version, format_index=1):
+    """Dossier de l'index de ``table_name`` pour ``version`` (et le format de l'index)."""
+    version = "".join(c if c.isalnum() else "_" for c in version)
+    return os.path.join(racine, f"{table_name}_{version}_f{format_index}")
+
+
+def existe(dossier):
+    return os.path.exists(os.path.join(dossier, FICHIER_META))
+
+
+def sauver(dossier, tableaux, lignes, meta=None):
+    """Écrit les ``tableaux`` numpy, le DataFrame ``lignes`` et ``meta`` dans ``dossier``."""
+    # Écriture dans un dossier temporaire puis renommage : pas d'index à moitié écrit
+    temporaire = f"{dossier}.tmp{os.getpid()}_{threading.get_ident()}"
+    shutil.rmtree(temporaire, ignore_errors=True)
+    os.makedirs(temporaire)
+    for nom, tableau in tableaux.items():
+        np.save(os.path.join(temporaire, f"{nom}.npy"), tableau)
+    con = duckdb.connect()
+    con.register("lignes", lignes)
+    con.execute(f"COPY lignes TO '{os.path.join(temporaire, FICHIER_LIGNES)}' (FORMAT PARQUET)")
+    con.close()
+    with open(os.path.join(temporaire, FICHIER_META), "w", encoding="utf-8") as f:
+        json.dump({"tableaux": list(tableaux), **(meta or {})}, f, ensure_ascii=False)
+    shutil.rmtree(dossier, ignore_errors=True)
+    os.replace(temporaire, dossier)
+
+
+def charger(dossier):
+    """(tableaux en mémoire mappée, lignes, meta) d'un index écrit par sauver()."""
+    with open(os.path.join(dossier, FICHIER_META), encoding="utf-8") as f:
+        meta = json.load(f)
+    tableaux = {nom: np.load(os.path.join(dossier, f"{nom}.npy"), mmap_mode="r") for nom in meta.pop("tableaux")}
+    con = duckdb.connect()
+    res = con.execute("SELECT * FROM read_parquet(?)", [os.path.join(dossier, FICHIER_LIGNES)])
+    lignes = db.en_dataframe(res, CATEGORIES)
+    con.close()
+    return tableaux, lignes, meta
+
+
+def purger(racine, table_name, garder=None):
+    """Supprime les index de ``table_name`` sous ``racine``, sauf le dossier ``garder``."""
+    if not os.path.isdir(racine):
+        return
+    for ancien in os.listdir(racine):
+        chemin = os.path.join(racine, ancien)
+        if ancien.startswith(f"{table_name}_") and chemin != garder:
+            shutil.rmtree(chemin, ignore_errors=True)
+
+
+class IndexVersionne:
+    """Index de la version courante d'une table, construit ou rouvert à la demande.
+
+    ``construire(dossier)`` lit la table, écrit l'index avec sauver() et le
+    renvoie ; ``ouvrir(dossier)`` rouvre un index déjà écrit.
+    """
+
+    def __init__(self, racine, table_name, construire, ouvrir, format_index=1):
+        self.racine = racine
+        self.table_name = table_name
+        self._construire = construire
+        self._ouvrir = ouvrir
+        self._format = format_index
+        self._verrou = threading.Lock()
+        self._courant = None
+
+    def pret(self, version):
+        """Vrai si l'index de ``version`` est déjà en mémoire."""
+        courant = self._courant
+        return courant is not None and courant[0] == version
+
+    def obtenir(self):
+        version = db.version_table(self.table_name)
+        with self._verrou:
+            if not self.pret(version):
+                dossier = dossier_version(self.racine, self.table_name, version, self._format)
+                if existe(dossier):
+                    index = self._ouvrir(dossier)
+                else:
+                    os.makedirs(self.racine, exist_ok=True)
+                    # Les index des versions précédentes ne servent plus
+                    purger(self.racine, self.table_name)
+                    index = self._construire(dossier)
+                self._courant = (version, index)
+            return self._courant[1]
+
+    def oublier(self):
+        """Oublie l'index en mémoire (le dossier sur disque reste)."""
+        with self._verrou:
+            self._courant = None
@@ -0,0 +1,408 @@
+"""Import de restaurants depuis des fichiers JSON / JSONL (Yelp, Google Places ou à plat).
+
+Usage : python ingestion.py exemples/restaurants.jsonl [--base donnees/essai.duckdb] [--lot 5000]
+
+Les enregistrements traversent une chaîne de générateurs : lecture,
+aplatissement des formats connus, normalisation (villes, spécialités,
+prix, notation), dédoublonnage sur une clé stable, puis regroupement en
+lots Arrow. La mémoire reste bornée par la taille d'un lot (plus les clés
+déjà vues).
+
+Chaque lot est écrit en une fois par table (« upsert ») : une ligne déjà
+présente n'est réécrite que si son empreinte a changé, les autres sont
+ajoutées. Les colonnes dérivées de preparation.py sont renseignées pour les
+lignes écrites ; python preparation.py reste utile de temps en temps pour
+retrier les tables et coder les libellés de prix inconnus. Sans --base,
+l'import vise MotherDuck.
+"""
+import argparse
+from collections import Counter
+import hashlib
+import json
+import math
+import re
+
+import duckdb
+import pyarrow as pa
+
+from chat import replier
+import config
+from cube import construire_cube
+import db
+from grille import COLONNE_CELLULE, expression_sql_cellule
+from preparation import NIVEAUX_PRIX, colonnes, expression_prix_connu
+
+# Libellés affichés des niveaux de NIVEAUX_PRIX, dans le même ordre
+LIBELLES_PRIX = ["Bon marché", "Modéré", "Cher", "Très cher"]
+TAILLE_LOT = 5000
+# Mots gardés en minuscules dans les noms de villes (Aix-en-Provence)
+PARTICULES = {"en", "sur", "sous", "de", "des", "du", "la", "le", "les", "lès", "d", "l", "et", "aux"}
+
+SCHEMA = pa.schema([
+    ("identifiant", pa.string()),
+    ("nom", pa.string()),
+    ("ville", pa.string()),
+    ("spécialité", pa.string()),
+    ("niveau de prix (libellé)", pa.string()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("notation", pa.float64()),
+    ("empreinte", pa.string()),
+])
+TYPES_SQL = {pa.string(): "VARCHAR", pa.float64(): "DOUBLE"}
+# Colonnes dérivées (voir preparation.py), calculées depuis les colonnes du lot « l »
+DERIVEES = {
+    "prix_code": ("INTEGER", expression_prix_connu('l."niveau de prix (libellé)"')),
+    COLONNE_CELLULE: ("BIGINT", expression_sql_cellule("l.latitude", "l.longitude")),
+}
+
+
+# Lecture
+
+def _elements_tableau(fichier, taille_bloc=1 << 16):
+    """Éléments d'un tableau JSON lus au fil du fichier, sans le charger en entier."""
+    decodeur = json.JSONDecoder()
+    tampon = fichier.read(taille_bloc)
+    pos = tampon.index("[") + 1
+    while True:
+        # Séparateurs entre éléments
+        while pos < len(tampon) and tampon[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(tampon):
+            tampon, pos = fichier.read(taille_bloc), 0
+            if not tampon:
+                return
+            continue
+        if tampon[pos] == "]":
+            return
+        try:
+            element, pos = decodeur.raw_decode(tampon, pos)
+        except json.JSONDecodeError:
+            # Élément coupé en fin de bloc : on complète le tampon
+            bloc = fichier.read(taille_bloc)
+            if not bloc:
+                raise
+            tampon, pos = tampon[pos:] + bloc, 0
+            continue
+        yield element
+        if pos > taille_bloc:
+            tampon, pos = tampon[pos:], 0
+
+
+def lire(chemins):
+    """Enregistrements bruts des fichiers : une ligne par objet (.jsonl) ou document JSON."""
+    for chemin in chemins:
+        with open(chemin, encoding="utf-8") as fichier:
+            if chemin.endswith((".jsonl", ".ndjson")):
+                for ligne in fichier:
+                    if ligne.strip():
+                        yield json.loads(ligne)
+                continue
+            debut = fichier.read(1)
+            while debut.isspace():
+                debut = fichier.read(1)
+            fichier.seek(0)
+            if debut == "[":
+                yield from _elements_tableau(fichier)
+                continue
+            # Réponse d'API entière : {"businesses": [...]} (Yelp), {"results": [...]} (Google)
+            document = json.load(fichier)
+            if isinstance(document, dict):
+                yield from document.get("businesses") or document.get("results") or [document]
+            else:
+                yield from document
+
+
+# Étapes de la chaîne
+
+def _champ(enregistrement, *chemins):
+    """Première valeur non vide parmi les chemins « a.b.c » (premier élément des listes)."""
+    for chemin in chemins:
+        valeur = enregistrement
+        for cle in chemin.split("."):
+            if isinstance(valeur, list):
+                valeur = valeur[0] if valeur else None
+            if not isinstance(valeur, dict):
+                valeur = None
+                break
+            valeur = valeur.get(cle)
+        if isinstance(valeur, list):
+            valeur = valeur[0] if valeur else None
+        if valeur not in (None, ""):
+            return valeur
+    return None
+
+
+def aplatir(enregistrements):
+    """Champs utiles des formats Yelp, Google Places et à plat, sous des noms communs."""
+    for enr in enregistrements:
+        yield {
+            "id_source": _champ(enr, "identifiant", "id", "place_id"),
+            "nom": _champ(enr, "nom", "name"),
+            "ville": _champ(enr, "ville", "location.city", "city"),
+            "specialite": _champ(enr, "spécialité", "specialite", "categories.title", "types"),
+            "prix": _champ(enr, "niveau de prix (libellé)", "prix", "price", "price_level"),
+            "latitude": _champ(enr, "latitude", "coordinates.latitude", "geometry.location.lat"),
+            "longitude": _champ(enr, "longitude", "coordinates.longitude", "geometry.location.lng"),
+            "notation": _champ(enr, "notation", "rating"),
+        }
+
+
+def _texte(valeur):
+    if valeur is None:
+        return None
+    texte = re.sub(r"\s+", " ", str(valeur)).strip()
+    return texte or None
+
+
+def casse_ville(ville):
+    """« AIX EN PROVENCE » → « Aix en Provence » ; les particules restent en minuscules."""
+    def mot(m):
+        if m.start() and m.group(0) in PARTICULES:
+            return m.group(0)
+        return m.group(0).capitalize()
+    return re.sub(r"[^\W\d_]+", mot, ville.lower())
+
+
+def libelle_prix(valeur):
+    """Libellé de prix depuis « €€ », « $$$ », un niveau Google (0-4) ou un texte."""
+    if isinstance(valeur, bool):
+        return None
+    if isinstance(valeur, (int, float)):
+        if math.isnan(valeur):
+            return None
+        return LIBELLES_PRIX[min(max(int(valeur), 1), len(LIBELLES_PRIX)) - 1]
+    texte = _texte(valeur)
+    if texte is None:
+        return None
+    if set(texte) <= set("€$"):
+        return LIBELLES_PRIX[min(len(texte), len(LIBELLES_PRIX)) - 1]
+    cle = replier(texte)
+    return LIBELLES_PRIX[NIVEAUX_PRIX.index(cle)] if cle in NIVEAUX_PRIX else texte
+
+
+def note(valeur):
+    """Notation sur 5 : nombres, « 4,5 », « 4.5/5 », « 9/10 » ; None si illisible ou hors bornes."""
+    if isinstance(valeur, bool) or valeur is None:
+        return None
+    if isinstance(valeur, (int, float)):
+        note_sur_5 = float(valeur)
+    else:
+        m = re.match(r"\s*(\d+(?:\.\d+)?)\s*(?:/\s*(\d+(?:\.\d+)?))?\s*$", str(valeur).replace(",", "."))
+        if not m:
+            return None
+        note_sur_5 = float(m.group(1))
+        if m.group(2) and float(m.group(2)) > 0:
+            note_sur_5 = note_sur_5 / float(m.group(2)) * 5
+    if math.isnan(note_sur_5) or not 0 <= note_sur_5 <= 5:
+        return None
+    return round(note_sur_5, 2)
+
+
+def _coordonnee(valeur, borne):
+    try:
+        valeur = float(valeur)
+    except (TypeError, ValueError):
+        return None
+    return valeur if math.isfinite(valeur) and -borne <= valeur <= borne else None
+
+
+def cle_stable(nom, ville, latitude, longitude):
+    """Identifiant d'un restaurant sans identifiant source ; voir expression_sql_cle_stable()."""
+    lat = "" if latitude is None else f"{latitude:.4f}"
+    lon = "" if longitude is None else f"{longitude:.4f}"
+    texte = f"{replier(nom or '')}|{replier(ville or '')}|{lat}|{lon}"
+    return "h:" + hashlib.sha256(texte.encode("utf-8")).hexdigest()[:24]
+
+
+def _sql_replier(colonne):
+    # Même pliage que chat.replier()
+    return f"""trim(regexp_replace(regexp_replace(lower(strip_accents(COALESCE({colonne}, ''))), '[-''’]', ' ', 'g'), '\\s+', ' ', 'g'))"""
+
+
+def expression_sql_cle_stable():
+    """cle_stable() calculée par DuckDB, pour les lignes chargées avant l'import."""
+    lat = "COALESCE(printf('%.4f', latitude), '')"
+    lon = "COALESCE(printf('%.4f', longitude), '')"
+    texte = f"{_sql_replier('nom')} || '|' || {_sql_replier('ville')} || '|' || {lat} || '|' || {lon}"
+    return f"'h:' || left(sha256({texte}), 24)"
+
+
+def normaliser(enregistrements, graphies=None):
+    """Textes nettoyés, villes à une seule graphie, prix en libellés, notation sur 5.
+
+    ``graphies`` associe une ville repliée à sa graphie retenue (celles
+    déjà en base) ; il est complété au fil du flux.
+    """
+    graphies = {} if graphies is None else graphies
+    for enr in enregistrements:
+        nom = _texte(enr["nom"])
+        if nom is None:
+            continue
+        ville = _texte(enr["ville"])
+        if ville is not None:
+            if ville.islower() or ville.isupper():
+                ville = casse_ville(ville)
+            # Graphie déjà en base, sinon première rencontrée
+            ville = graphies.setdefault(replier(ville), ville)
+        specialite = _texte(enr["specialite"])
+        if specialite is not None:
+            specialite = specialite[0].upper() + specialite[1:]
+        latitude = _coordonnee(enr["latitude"], 90)
+        longitude = _coordonnee(enr["longitude"], 180)
+        id_source = _texte(enr["id_source"])
+        ligne = {
+            "identifiant": id_source if id_source is not None else cle_stable(nom, ville, latitude, longitude),
+            "nom": nom,
+            "ville": ville,
+            "spécialité": specialite,
+            "niveau de prix (libellé)": libelle_prix(enr["prix"]),
+            "latitude": latitude,
+            "longitude": longitude,
+            "notation": note(enr["notation"]),
+        }
+        ligne["empreinte"] = hashlib.sha256(
+            json.dumps(list(ligne.values()), ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:24]
+        yield ligne
+
+
+def dedoublonner(enregistrements):
+    """Première occurrence de chaque identifiant ; seules les clés sont gardées en mémoire."""
+    vues = set()
+    for enr in enregistrements:
+        if enr["identifiant"] not in vues:
+            vues.add(enr["identifiant"])
+            yield enr
+
+
+def lots(enregistrements, taille=TAILLE_LOT):
+    """Tables Arrow de ``taille`` enregistrements au plus."""
+    lot = []
+    for enr in enregistrements:
+        lot.append(enr)
+        if len(lot) == taille:
+            yield pa.Table.from_pylist(lot, schema=SCHEMA)
+            lot = []
+    if lot:
+        yield pa.Table.from_pylist(lot, schema=SCHEMA)
+
+
+def _compter(enregistrements, compteurs, cle):
+    for enr in enregistrements:
+        compteurs[cle] += 1
+        yield enr
+
+
+# Écriture
+
+def graphies_villes(con, tables):
+    """Graphie déjà stockée de chaque ville des ``tables``, par clé repliée."""
+    graphies = {}
+    for table_name in tables:
+        for (ville,) in con.execute(f"SELECT DISTINCT ville FROM {table_name} WHERE ville IS NOT NULL ORDER BY ville").fetchall():
+            graphies.setdefault(replier(ville), ville)
+    return graphies
+
+
+def preparer_table(con, table_name):
+    """Crée la table, ou ajoute les colonnes de l'import à une table chargée autrement."""
+    definitions = [(champ.name, TYPES_SQL[champ.type]) for champ in SCHEMA]
+    definitions += [(nom, type_sql) for nom, (type_sql, _) in DERIVEES.items()]
+    con.execute(f"""CREATE TABLE IF NOT EXISTS {table_name} ({", ".join(f'"{nom}" {type_sql}' for nom, type_sql in definitions)})""")
+    existantes = colonnes(con, table_name)
+    for nom, type_sql in definitions:
+        if nom not in existantes:
+            con.execute(f'ALTER TABLE {table_name} ADD COLUMN "{nom}" {type_sql}')
+    # Les lignes chargées à la main reçoivent la clé qu'aurait calculée l'import
+    con.execute(f"UPDATE {table_name} SET identifiant = {expression_sql_cle_stable()} WHERE identifiant IS NULL")
+
+
+def ecrire_lot(con, table_name, lot):
+    """Upsert du lot Arrow dans la table ; renvoie (ajoutées, mises à jour).
+
+    La version de la table est incrémentée dans la même transaction que
+    l'écriture : même si l'import s'interrompt ensuite, les lignes déjà
+    écrites sont vues par l'application, les index et replique.py.
+    """
+    noms = [f'"{champ.name}"' for champ in SCHEMA if champ.name != "identifiant"]
+    # Code des libellés inconnus déjà présents dans la table, sinon NULL jusqu'à la préparation
+    derivees = dict(DERIVEES)
+    derivees["prix_code"] = ("INTEGER", f"""COALESCE({DERIVEES["prix_code"][1]}, (
+        SELECT MIN(p.prix_code) FROM {table_name} AS p
+        WHERE p."niveau de prix (libellé)" = l."niveau de prix (libellé)"
+    ))""")
+    con.register("lot", lot)
+    try:
+        con.execute("BEGIN TRANSACTION")
+        # Seules les lignes dont l'empreinte a changé sont réécrites
+        mises_a_jour = con.execute(f"""
+            UPDATE {table_name} AS t SET
+                {", ".join(f"{nom} = l.{nom}" for nom in noms)},
+                {", ".join(f"{nom} = {expression}" for nom, (_, expression) in derivees.items())}
+            FROM lot AS l
+            WHERE t.identifiant = l.identifiant AND t.empreinte IS DISTINCT FROM l.empreinte
+        """).fetchone()[0]
+        ajoutees = con.execute(f"""
+            INSERT INTO {table_name} (identifiant, {", ".join(noms)}, {", ".join(derivees)})
+            SELECT l.identifiant, {", ".join(f"l.{nom}" for nom in noms)},
+                {", ".join(expression for _, expression in derivees.values())}
+            FROM lot AS l
+            WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS t WHERE t.identifiant = l.identifiant)
+        """).fetchone()[0]
+        if ajoutees or mises_a_jour:
+            db.nouvelle_version(con, table_name)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.unregister("lot")
+    return ajoutees, mises_a_jour
+
+
+def importer(chemins, con, tables=config.TABLES_SOURCES, taille_lot=TAILLE_LOT):
+    """Importe les fichiers dans chaque table ; renvoie les compteurs de l'import."""
+    compteurs = Counter()
+    for table_name in tables:
+        preparer_table(con, table_name)
+    chaine = _compter(lire(chemins), compteurs, "lus")
+    chaine = dedoublonner(normaliser(aplatir(chaine), graphies_villes(con, tables)))
+    for lot in lots(_compter(chaine, compteurs, "retenus"), taille_lot):
+        for table_name in tables:
+            ajoutees, mises_a_jour = ecrire_lot(con, table_name, lot)
+            compteurs[f"{table_name}.ajoutees"] += ajoutees
+            compteurs[f"{table_name}.mises_a_jour"] += mises_a_jour
+    if compteurs[f"{config.TABLE_ANALYSES}.ajoutees"] or compteurs[f"{config.TABLE_ANALYSES}.mises_a_jour"]:
+        # Cube et numéro de version changent ensemble : le cube déjà en cache
+        # dans l'application (clé : version) n'est plus servi
+        con.execute("BEGIN TRANSACTION")
+        try:
+            construire_cube(con)
+            db.nouvelle_version(con, config.TABLE_CUBE)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    return compteurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fichiers", nargs="+", help="fichiers .json, .jsonl ou .ndjson")
+    parser.add_argument("--base", help="fichier DuckDB local (par défaut : MotherDuck)")
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT)
+    parser.add_argument("--tables", nargs="*", default=config.TABLES_SOURCES)
+    args = parser.parse_args()
+
+    con = duckdb.connect(args.base or config.chemin_motherduck())
+    try:
+        compteurs = importer(args.fichiers, con, args.tables, args.lot)
+    finally:
+        con.close()
+    print(f"{compteurs['lus']} enregistrements lus, {compteurs['retenus']} retenus (sans doublons ni noms vides)")
+    for table_name in args.tables:
+        print(
+            f"✅ {table_name} : {compteurs[f'{table_name}.ajoutees']} ajoutées, "
+            f"{compteurs[f'{table_name}.mises_a_jour']} mises à jour"
+        )
@@ -0,0 +1,126 @@
+"""Mesure légère des étapes de chaque exécution (rerun) des pages Streamlit.
+
+Chaque étape est enregistrée dans un « span » (nom, durée, attributs comme
+le nombre de lignes ou d'octets récupérés). Les spans de l'exécution
+courante alimentent le panneau de debug (?debug=1 ou MIAM_DEBUG=1) et,
+si MIAM_SPANS_LOG indique un fichier, une ligne JSON par span y est écrite
+pour agréger les p95 entre sessions.
+"""
+from contextlib import contextmanager
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+CHEMIN_LOG = os.getenv("MIAM_SPANS_LOG")
+DEBUG = os.getenv("MIAM_DEBUG") == "1"
+
+_local = threading.local()
+_journal = logging.getLogger("miam.spans")
+_journal.propagate = False
+if CHEMIN_LOG and not _journal.handlers:
+    _handler = logging.FileHandler(CHEMIN_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _journal.addHandler(_handler)
+    _journal.setLevel(logging.INFO)
+
+
+class Rerun:
+    """Spans d'une exécution de page ; partageable avec des threads de travail."""
+
+    def __init__(self, session="", page="", numero=0):
+        self.session = session
+        self.page = page
+        self.numero = numero
+        self.debut = time.perf_counter()
+        self.spans = []
+        self._verrou = threading.Lock()
+
+    def ajouter(self, span):
+        with self._verrou:
+            self.spans.append(span)
+
+
+def demarrer_rerun(session_state, page):
+    """Ouvre la mesure d'une nouvelle exécution de ``page`` pour la session."""
+    if "_instrumentation_session" not in session_state:
+        session_state["_instrumentation_session"] = uuid.uuid4().hex[:12]
+        session_state["_instrumentation_reruns"] = 0
+    session_state["_instrumentation_reruns"] += 1
+    rerun = Rerun(session_state["_instrumentation_session"], page, session_state["_instrumentation_reruns"])
+    attacher(rerun)
+    return rerun
+
+
+def attacher(rerun):
+    """Rattache le thread courant à ``rerun`` (utile dans un pool de threads)."""
+    _local.rerun = rerun
+    _local.pile = []
+
+
+def rerun_courant():
+    return getattr(_local, "rerun", None)
+
+
+@contextmanager
+def span(nom, **attributs):
+    """Mesure le bloc ; le dictionnaire renvoyé peut recevoir des attributs."""
+    pile = getattr(_local, "pile", None)
+    if pile is None:
+        pile = _local.pile = []
+    parent = pile[-1] if pile else None
+    pile.append(nom)
+    debut = time.perf_counter()
+    try:
+        yield attributs
+    finally:
+        pile.pop()
+        duree_ms = (time.perf_counter() - debut) * 1000
+        rerun = rerun_courant()
+        enregistrement = {"span": nom, "parent": parent, "duree_ms": round(duree_ms, 3), **attributs}
+        if rerun is not None:
+            enregistrement["debut_ms"] = round((debut - rerun.debut) * 1000, 3)
+            rerun.ajouter(enregistrement)
+        if _journal.handlers:
+            _journal.info(json.dumps({
+                "ts": time.time(),
+                "session": rerun.session if rerun else None,
+                "page": rerun.page if rerun else None,
+                "rerun": rerun.numero if rerun else None,
+                **enregistrement,
+            }, ensure_ascii=False, default=str))
+
+
+def trace(nom=None):
+    """Décorateur : chaque appel de la fonction est mesuré dans un span."""
+    def decorer(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            with span(nom or fonction.__name__):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorer
+
+
+def afficher_panneau(st):
+    """Panneau de debug de l'exécution courante, affiché seulement sur demande."""
+    if not (DEBUG or st.query_params.get("debug") == "1"):
+        return
+    import pandas as pd
+
+    import db
+
+    rerun = rerun_courant()
+    if rerun is None:
+        return
+    total_ms = (time.perf_counter() - rerun.debut) * 1000
+    with st.expander(f"⏱️ Exécution n°{rerun.numero} : {total_ms:.0f} ms", expanded=True):
+        spans = pd.DataFrame(rerun.spans)
+        if not spans.empty:
+            spans = spans.sort_values("debut_ms", kind="mergesort")
+            st.dataframe(spans, hide_index=True)
+            st.bar_chart(spans.groupby("span")["duree_ms"].sum())
+        st.caption(f"Cache des requêtes : {db.cache.statistiques()}")
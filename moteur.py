@@ -0,0 +1,96 @@
+"""Moteur de recherche de restaurants, commun à app.py et au service JSON.
+
+Filtres catégoriels et note minimale en SQL, rayon et tri par distance en
+mémoire (voir candidats.py), statistiques par ville reprises du moteur de
+chat. Aucune dépendance à Streamlit : le module s'importe depuis n'importe
+quel client.
+"""
+from candidats import Candidats
+import chat
+import config
+import db
+from distances import boite_englobante, distances_km
+from grille import filtre_sql_boite
+
+TABLE = config.TABLE_RESTAURANTS
+RAYON_MAX = 50
+# Colonnes à faible cardinalité, chargées en catégories
+COLONNES_CATEGORIELLES = ("ville", "spécialité", "niveau de prix (libellé)")
+
+
+def vocabulaires():
+    """Valeurs uniques pour les filtres : spécialités et libellés de prix avec leur code."""
+    specialites = [s[0] for s in db.requete(f'SELECT DISTINCT "spécialité" FROM {TABLE} WHERE "spécialité" IS NOT NULL ORDER BY "spécialité"', mode="all")]
+    # Libellés de prix dans l'ordre des niveaux, avec leur code
+    codes_prix = dict(db.requete(f'SELECT DISTINCT "niveau de prix (libellé)", prix_code FROM {TABLE} WHERE prix_code IS NOT NULL ORDER BY prix_code', mode="all"))
+    return specialites, codes_prix
+
+
+def requete_filtres(specialite=None, prix_code=None):
+    """SQL et paramètres des restaurants d'une spécialité et d'un code de prix (None : tous)."""
+    query = f"""
+    SELECT ville, "spécialité", "niveau de prix (libellé)", latitude, longitude, nom, notation
+    FROM {TABLE}
+    WHERE 1=1
+    """
+    params = []
+    if specialite is not None:
+        query += ' AND "spécialité" = ?'
+        params.append(specialite)
+    if prix_code is not None:
+        query += " AND prix_code = ?"
+        params.append(prix_code)
+    return query, params
+
+
+def charger_candidats(position, specialite=None, prix_code=None, rayon_max=RAYON_MAX):
+    """Restaurants filtrés dans la boîte englobant le cercle de ``rayon_max`` km (non triés)."""
+    query, params = requete_filtres(specialite, prix_code)
+    clause_boite, params_boite = filtre_sql_boite(*boite_englobante(position[0], position[1], rayon_max))
+    return db.requete(f"{query} AND {clause_boite}", params + params_boite, categories=COLONNES_CATEGORIELLES)
+
+
+def rechercher(specialite=None, prix_code=None, note_min=None, position=None, rayon=None):
+    """Restaurants correspondant aux filtres.
+
+    Avec ``position`` et ``rayon``, seuls les restaurants à moins de
+    ``rayon`` km sont gardés, du plus proche au plus loin, avec leur
+    ``distance_km`` ; sinon l'ordre est celui de la table.
+    """
+    if position is not None and rayon is not None:
+        candidats = Candidats(charger_candidats(position, specialite, prix_code, rayon), position)
+        return candidats.filtrer(rayon, note_min)
+    query, params = requete_filtres(specialite, prix_code)
+    if note_min is not None:
+        query += " AND notation >= ?"
+        params.append(note_min)
+    return db.requete(query, params, categories=COLONNES_CATEGORIELLES)
+
+
+def rechercher_nom(texte, k, position=None):
+    """Jusqu'à ``k`` restaurants dont le nom contient chaque mot de ``texte``, en SQL.
+
+    Recherche de repli tant que l'index des noms (noms.py) n'est pas prêt :
+    ni faute de frappe tolérée ni classement par ressemblance. Avec
+    ``position``, les plus proches d'abord, avec leur ``distance_km`` ;
+    sinon les noms les plus courts.
+    """
+    query, params = requete_filtres()
+    for mot in texte.split():
+        # % et _ recherchés tels quels
+        mot = mot.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query += " AND strip_accents(nom) ILIKE '%' || strip_accents(?) || '%' ESCAPE '\\'"
+        params.append(mot)
+    if position is None:
+        query += " ORDER BY length(nom), nom LIMIT ?"
+        return db.requete(query, params + [k], categories=COLONNES_CATEGORIELLES)
+    # Ordre approché (degrés de longitude réduits à la latitude), recalculé ensuite
+    query += " ORDER BY pow(latitude - ?, 2) + pow((longitude - ?) * cos(radians(?)), 2) NULLS LAST, nom LIMIT ?"
+    data = db.requete(query, params + [position[0], position[1], position[0], k], categories=COLONNES_CATEGORIELLES)
+    data = data.assign(distance_km=distances_km(position[0], position[1], data["latitude"], data["longitude"]))
+    return data.sort_values("distance_km", kind="stable").reset_index(drop=True)
+
+
+def statistiques_ville(ville):
+    """Statistiques d'une ville (nombre, spécialité dominante, note moyenne, prix), ou None."""
+    return chat.moteur().villes.get(chat.replier(ville))
@@ -0,0 +1,422 @@
+"""Recherche des restaurants par nom : index inversé de trigrammes.
+
+Les noms, sans accents ni majuscules, sont découpés en mots bordés
+d'espaces (« pizza » → «  p», « pi», «piz», «izz», «zza», «za ») ; chaque
+trigramme renvoie à la liste des restaurants qui le contiennent. L'index
+est construit une fois par version de la table des restaurants, en
+arrière-plan, enregistré dans donnees/index_noms/ et rouvert en mémoire
+mappée (voir index_disque.py) ; en attendant, app.py cherche en SQL.
+
+Pendant la frappe, le dernier mot de la recherche est traité comme un
+préfixe. Un nom est retenu quand il contient au moins SEUIL_SIMILARITE des
+trigrammes recherchés, ce qui tolère les fautes de frappe ; les résultats
+sont classés par similarité puis, si une position est donnée, par distance.
+
+La similarité n'est pas calculée pour tous les noms : les candidats
+viennent d'abord des listes des trigrammes rares, puis les noms qui n'ont
+en commun que des trigrammes fréquents (« res », « le ») sont parcourus
+du plus court au plus long, ou par boîtes de plus en plus grandes autour
+de la position, tant qu'ils peuvent encore entrer dans les k premiers. La
+distance n'est calculée que pour les noms assez similaires pour y entrer.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from chat import replier
+import config
+import db
+from demarrage import prechauffer
+from distances import RAYON_MOYEN_KM, boite_englobante, distances_km
+from grille import cellules, plages_cellules
+import index_disque
+from index_disque import CATEGORIES, COLONNES_LIGNES
+
+DOSSIER_INDEX = os.path.join(config.DOSSIER_DONNEES, "index_noms")
+# Numéro de format des fichiers : un index d'un format précédent est reconstruit
+FORMAT = 2
+# Part minimale des trigrammes recherchés présents dans le nom
+SEUIL_SIMILARITE = 0.5
+# Similarité : part de la recherche retrouvée, complétée par l'indice de Jaccard
+POIDS_COUVERTURE = 0.8
+# Un trigramme présent dans plus d'un nom sur FRACTION_DENSE a aussi un masque de bits
+FRACTION_DENSE = 32
+LONGUEUR_MAX = 100
+# Pénalité de distance : POIDS_DISTANCE par facteur 10 sur (1 + distance en km)
+POIDS_DISTANCE = 0.05
+DISTANCE_MAX_KM = 20000
+# Noms évalués par étape du parcours ; distances exactes calculées par lot
+LOT = 4096
+LOT_DISTANCES = 256
+RAYON_INITIAL_KM = 2
+
+# Pliage des noms par DuckDB, avec les règles de plier() ; les noms qui
+# restent hors ASCII (ligatures, formes pleine chasse...) repassent par plier()
+SQL_PLIER = r"trim(regexp_replace(lower(strip_accents(nom)), '[^\p{L}\p{N}]+', ' ', 'g'))"
+
+
+def plier(texte):
+    """Nom sans accents ni majuscules, réduit à des mots séparés par une espace."""
+    return re.sub(r"[\W_]+", " ", replier(texte)).strip()
+
+
+def _codes(points):
+    # Trois caractères (points de code) dans un entier 64 bits
+    return (points[0].astype("int64") << 42) | (points[1].astype("int64") << 21) | points[2].astype("int64")
+
+
+def _trigrammes_valides(points):
+    c1, c2, c3 = points[:-2], points[1:-1], points[2:]
+    # Les trigrammes à cheval entre deux mots finissent par deux espaces
+    valides = ~((c2 == 32) & (c3 == 32))
+    return _codes((c1[valides], c2[valides], c3[valides])), valides
+
+
+def trigrammes(texte, prefixe=False):
+    """Codes des trigrammes de ``texte`` déjà plié ; avec ``prefixe``, le dernier mot peut être incomplet."""
+    mots = texte.split()
+    bordes = "".join(f"  {mot} " for mot in mots)
+    if prefixe and mots:
+        bordes = bordes[:-1]
+    points = np.frombuffer(bordes.encode("utf-32-le"), dtype="uint32")
+    if len(points) < 3:
+        return np.empty(0, dtype="int64")
+    return np.unique(_trigrammes_valides(points)[0])
+
+
+def _index_inverse(plies):
+    """Trigrammes triés, début de leur liste dans ``postings`` et nombre de trigrammes par nom."""
+    nb_noms = len(plies)
+    # Noms pliés séparés par "\n" : le séparateur compte dans le nom qu'il termine
+    points = np.frombuffer("\n".join(plies.tolist()).encode("utf-32-le"), dtype="uint32")
+    separateurs = points == 10
+    lignes = np.cumsum(separateurs, dtype="int32")
+    lignes -= separateurs
+    # Les séparateurs deviennent des espaces et la suite est bordée d'espaces.
+    # Les trigrammes de trigrammes() finissent chacun à un caractère qui ne
+    # suit pas un espace ou n'en est pas un ; après un espace, ils commencent
+    # par un espace, comme dans un mot bordé de deux espaces. Chaque
+    # trigramme appartient au nom de son dernier caractère.
+    points = np.concatenate([
+        np.full(2, 32, dtype="uint32"), np.where(separateurs, np.uint32(32), points), np.full(1, 32, dtype="uint32")
+    ])
+    lignes = np.concatenate([lignes, np.array([max(nb_noms - 1, 0)], dtype="int32")])
+    del separateurs
+    espace_avant = points[1:-1] == 32
+    valides = ~(espace_avant & (points[2:] == 32))
+    lignes = lignes[valides]
+    triplets = [np.where(espace_avant, np.uint32(32), points[:-2])[valides], points[1:-1][valides], points[2:][valides]]
+    del espace_avant, valides
+
+    # Caractères numérotés dans l'alphabet des noms : trigramme et restaurant
+    # tiennent dans une clé entière, triée par valeur (bien plus vite qu'un argsort)
+    presents = np.zeros(int(points.max()) + 1, dtype=bool)
+    presents[points] = True
+    alphabet = np.flatnonzero(presents).astype("uint32")
+    del points, presents
+    bits = max(nb_noms - 1, 1).bit_length()
+    compact = len(alphabet) ** 3 << bits < 2 ** 63
+    if compact:
+        numeros = np.zeros(int(alphabet[-1]) + 1, dtype="int32")
+        numeros[alphabet] = np.arange(len(alphabet))
+        cles = numeros[triplets.pop(0)].astype("int64")
+        while triplets:
+            cles *= len(alphabet)
+            cles += numeros[triplets.pop(0)]
+    else:
+        # Alphabet trop grand : numérotation des trigrammes eux-mêmes
+        valeurs, cles = np.unique(_codes(tuple(triplets)), return_inverse=True)
+    del triplets
+    cles <<= bits
+    cles |= lignes
+    del lignes
+    cles.sort()
+    # Un trigramme répété dans un nom n'y compte qu'une fois
+    distinctes = np.ones(len(cles), dtype=bool)
+    distinctes[1:] = cles[1:] != cles[:-1]
+    cles = cles[distinctes]
+    lignes = (cles & ((1 << bits) - 1)).astype("int32")
+    ids = np.right_shift(cles, bits, out=cles)
+    del cles
+
+    debuts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1, [len(ids)]]).astype("int64")
+    if not len(ids):
+        debuts = debuts[:1]
+    ids = ids[debuts[:-1]]
+    if compact:
+        s1, reste = np.divmod(ids, len(alphabet) ** 2)
+        s2, s3 = np.divmod(reste, len(alphabet))
+        trigrammes_tries = _codes((alphabet[s1], alphabet[s2], alphabet[s3]))
+    else:
+        trigrammes_tries = valeurs[ids]
+
+    # Trigrammes très fréquents (« res », « le ») : leur liste est aussi
+    # gardée en masque de bits, plus rapide à consulter qu'à parcourir
+    frequents = np.flatnonzero(np.diff(debuts) > nb_noms // FRACTION_DENSE)
+    rang_dense = np.full(len(trigrammes_tries), -1, dtype="int32")
+    rang_dense[frequents] = np.arange(len(frequents))
+    denses = np.zeros((len(frequents), (nb_noms + 7) // 8), dtype="uint8")
+    for i, r in enumerate(frequents):
+        presents = np.zeros(nb_noms, dtype=bool)
+        presents[lignes[debuts[r]:debuts[r + 1]]] = True
+        denses[i] = np.packbits(presents)
+    nb_trigrammes = np.bincount(lignes, minlength=nb_noms).astype("int32")
+    return {
+        "trigrammes": trigrammes_tries,
+        "debuts": debuts,
+        "postings": lignes,
+        "nb_trigrammes": nb_trigrammes,
+        # Noms du plus court au plus long (en trigrammes)
+        "par_longueur": np.argsort(nb_trigrammes, kind="stable").astype("int32"),
+        "rang_dense": rang_dense,
+        "denses": denses,
+    }
+
+
+def _similarite(communs, nb_requete, nb_trigrammes):
+    couverture = communs / nb_requete
+    jaccard = communs / (nb_requete + nb_trigrammes - communs)
+    return POIDS_COUVERTURE * couverture + (1 - POIDS_COUVERTURE) * jaccard
+
+
+def _penalite(distances):
+    return POIDS_DISTANCE * np.log10(1 + distances)
+
+
+class _Classement:
+    """Les ``k`` meilleurs noms vus pendant une recherche, dans l'ordre final."""
+
+    def __init__(self, k, position, latitude, longitude):
+        self.k = k
+        self.position = position
+        self._latitude, self._longitude = latitude, longitude
+        self.lignes = np.empty(0, dtype="int64")
+        self.similarite = self.score = self.distances = np.empty(0)
+
+    def plancher(self):
+        """Score à atteindre pour entrer dans les ``k`` premiers."""
+        return -np.inf if len(self.score) < self.k else self.score[-1]
+
+    def ajouter(self, lignes, similarite):
+        """Classe des noms jamais vus ; la distance n'est calculée que pour ceux qui peuvent entrer."""
+        # Score maximal de chaque nom : sa similarité, puis, pour ceux qui
+        # restent candidats, la similarité moins la pénalité d'une distance minorée
+        haut, minore = similarite, self.position is None
+        taille_lot = max(LOT_DISTANCES, 2 * self.k)
+        while len(lignes):
+            garder = haut >= self.plancher()
+            lignes, similarite, haut = lignes[garder], similarite[garder], haut[garder]
+            if len(lignes) <= taille_lot:
+                self._fusionner(lignes, similarite)
+                return
+            if not minore and len(self.score):
+                distances = np.nan_to_num(self._distance_minimale(lignes), nan=DISTANCE_MAX_KM)
+                haut, minore = similarite - _penalite(distances), True
+                continue
+            lot = np.zeros(len(lignes), dtype=bool)
+            lot[np.argpartition(-haut, taille_lot - 1)[:taille_lot]] = True
+            self._fusionner(lignes[lot], similarite[lot])
+            lignes, similarite, haut = lignes[~lot], similarite[~lot], haut[~lot]
+
+    def _distance_minimale(self, lignes):
+        # Corde sur la sphère moyenne, moins 1 % (écart avec l'ellipsoïde) :
+        # jamais plus que distances_km()
+        lat1, lon1 = np.radians(self.position[0]), np.radians(self.position[1])
+        lat2, lon2 = np.radians(self._latitude[lignes]), np.radians(self._longitude[lignes])
+        h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 0.99 * 2 * RAYON_MOYEN_KM * np.sqrt(h)
+
+    def _fusionner(self, lignes, similarite):
+        score, distances = similarite, np.full(len(lignes), np.nan)
+        if self.position is not None:
+            distances = distances_km(self.position[0], self.position[1], self._latitude[lignes], self._longitude[lignes])
+            # Sans coordonnées : la pénalité maximale
+            score = similarite - _penalite(np.nan_to_num(distances, nan=DISTANCE_MAX_KM))
+        lignes = np.concatenate([self.lignes, lignes])
+        score = np.concatenate([self.score, score])
+        ordre = np.lexsort((lignes, -score))[:self.k]
+        self.lignes, self.score = lignes[ordre], score[ordre]
+        self.similarite = np.concatenate([self.similarite, similarite])[ordre]
+        self.distances = np.concatenate([self.distances, distances])[ordre]
+
+
+class IndexNoms:
+    def __init__(self, tableaux, lignes):
+        # Vues ndarray des fichiers mappés : le découpage d'un np.memmap est plus lent
+        self.__dict__.update({nom: np.asarray(tableau) for nom, tableau in tableaux.items()})
+        self.lignes = lignes
+
+    @classmethod
+    def construire(cls, data, dossier):
+        """Construit l'index des noms de ``data`` et l'enregistre dans ``dossier``.
+
+        ``nom_plie``, s'il est présent, donne les noms déjà pliés (None :
+        à plier ici). Les noms sont rangés par cellule de la grille : ceux
+        d'une même zone forment des plages contiguës.
+        """
+        cellules_noms = np.nan_to_num(cellules(data["latitude"], data["longitude"]), nan=np.inf)
+        if np.any(cellules_noms[1:] < cellules_noms[:-1]):
+            ordre = np.argsort(cellules_noms, kind="stable")
+            data, cellules_noms = data.iloc[ordre].reset_index(drop=True), cellules_noms[ordre]
+        plies = data["nom_plie"] if "nom_plie" in data else pd.Series(None, index=data.index)
+        plies = plies.astype(object)
+        manquants = plies.isna()
+        plies[manquants] = data["nom"][manquants].fillna("").astype(str).map(plier)
+
+        tableaux = _index_inverse(plies)
+        tableaux["cellules"] = cellules_noms
+        tableaux["latitude"] = data["latitude"].to_numpy(dtype="float64", na_value=np.nan)
+        tableaux["longitude"] = data["longitude"].to_numpy(dtype="float64", na_value=np.nan)
+        index_disque.sauver(dossier, tableaux, data[COLONNES_LIGNES])
+        return cls.charger(dossier)
+
+    @classmethod
+    def charger(cls, dossier):
+        tableaux, lignes, _ = index_disque.charger(dossier)
+        return cls(tableaux, lignes)
+
+    def _communs(self, lignes, rangs):
+        """Nombre de trigrammes des listes ``rangs`` contenus dans chaque nom de ``lignes``."""
+        communs = np.zeros(len(lignes), dtype="uint8")
+        # Position du bit de chaque nom dans les masques (np.packbits : bit de poids fort en premier)
+        octet, decalage = lignes >> 3, (7 - (lignes & 7)).astype("uint8")
+        for r in rangs:
+            if self.rang_dense[r] >= 0:
+                communs += (self.denses[self.rang_dense[r]][octet] >> decalage) & 1
+            else:
+                # Listes triées par restaurant : appartenance par recherche dichotomique
+                liste = self.postings[self.debuts[r]:self.debuts[r + 1]]
+                positions = np.minimum(np.searchsorted(liste, lignes), len(liste) - 1)
+                communs += liste[positions] == lignes
+        return communs
+
+    def _boite(self, position, rayon):
+        """Noms des cellules couvrant le cercle de ``rayon`` km autour de ``position``."""
+        plages = np.array(plages_cellules(*boite_englobante(position[0], position[1], rayon)), dtype="float64")
+        debuts = np.searchsorted(self.cellules, plages[:, 0], side="left")
+        fins = np.searchsorted(self.cellules, plages[:, 1], side="right")
+        return debuts, fins
+
+    def rechercher(self, texte, k=20, position=None):
+        """Les ``k`` restaurants dont le nom ressemble le plus à ``texte``, avec ``similarite``.
+
+        Avec ``position`` (lat, lon), ``distance_km`` est ajoutée et pénalise
+        les restaurants lointains : à similarité voisine, le plus proche passe
+        devant.
+        """
+        classement = _Classement(k, position, self.latitude, self.longitude)
+        requete = trigrammes(plier(texte[:LONGUEUR_MAX]), prefixe=not texte.endswith(" "))
+        if not len(requete) or not len(self.trigrammes) or k <= 0:
+            return self._resultat(classement)
+        n = len(requete)
+        seuil = max(1, int(np.ceil(SEUIL_SIMILARITE * n)))
+        # Listes des trigrammes présents dans l'index
+        rangs = np.minimum(np.searchsorted(self.trigrammes, requete), len(self.trigrammes) - 1)
+        rangs = rangs[self.trigrammes[rangs] == requete].tolist()
+        if len(rangs) < seuil:
+            return self._resultat(classement)
+
+        nb_noms = len(self.nb_trigrammes)
+        denses = [r for r in rangs if self.rang_dense[r] >= 0]
+        rares = [r for r in rangs if self.rang_dense[r] < 0]
+        vus = np.zeros(nb_noms, dtype=bool)
+
+        def evaluer(lignes, rangs_comptes, communs=0):
+            nouveaux = ~vus[lignes]
+            lignes = lignes[nouveaux]
+            vus[lignes] = True
+            communs = self._communs(lignes, rangs_comptes) + (communs[nouveaux] if np.ndim(communs) else communs)
+            garder = communs >= seuil
+            lignes, communs = lignes[garder], communs[garder]
+            classement.ajouter(lignes, _similarite(communs, n, self.nb_trigrammes[lignes]))
+
+        def evaluer_tous():
+            # Comptage sur tous les noms : masques de bits des trigrammes fréquents
+            communs = np.zeros(nb_noms, dtype="uint8")
+            for r in rangs:
+                if self.rang_dense[r] >= 0:
+                    communs += np.unpackbits(self.denses[self.rang_dense[r]], count=nb_noms)
+                else:
+                    communs[self.postings[self.debuts[r]:self.debuts[r + 1]]] += 1
+            lignes = np.flatnonzero((communs >= seuil) & ~vus)
+            communs = communs[lignes]
+            classement.ajouter(lignes, _similarite(communs, n, self.nb_trigrammes[lignes]))
+
+        taille_rares = sum(int(self.debuts[r + 1] - self.debuts[r]) for r in rares)
+        if taille_rares > nb_noms // 4:
+            evaluer_tous()
+            return self._resultat(classement)
+        if rares:
+            # Noms des listes rares, avec le nombre de ces listes qui les contiennent
+            toutes = np.sort(np.concatenate([self.postings[self.debuts[r]:self.debuts[r + 1]] for r in rares]))
+            premiers = np.flatnonzero(np.diff(toutes, prepend=-1))
+            evaluer(toutes[premiers].astype("int64"), denses, np.diff(premiers, append=len(toutes)).astype("uint8"))
+        if len(denses) < seuil:
+            return self._resultat(classement)
+
+        # Les autres noms n'ont en commun que des trigrammes fréquents :
+        # au mieux len(denses), avec le moins de trigrammes possible
+        def borne(nb_min):
+            return _similarite(len(denses), n, max(len(denses), nb_min))
+
+        if position is None:
+            # Du plus court au plus long : la similarité maximale décroît
+            parcourus, taille = 0, LOT
+            while parcourus < nb_noms and borne(self.nb_trigrammes[self.par_longueur[parcourus]]) >= classement.plancher():
+                if parcourus > nb_noms // 4:
+                    evaluer_tous()
+                    break
+                evaluer(self.par_longueur[parcourus:parcourus + taille].astype("int64"), denses)
+                parcourus, taille = parcourus + taille, taille * 2
+            return self._resultat(classement)
+
+        # Boîtes de plus en plus grandes : hors de la boîte de rayon R, un nom
+        # perd au moins la pénalité de R
+        sim_max, rayon = borne(self.nb_trigrammes[self.par_longueur[0]]), RAYON_INITIAL_KM
+        while True:
+            debuts, fins = self._boite(position, rayon)
+            if rayon >= DISTANCE_MAX_KM or (fins - debuts).sum() > nb_noms // 4:
+                evaluer_tous()
+                break
+            lignes = np.concatenate([np.arange(d, f) for d, f in zip(debuts, fins)])
+            evaluer(lignes, denses)
+            if sim_max - _penalite(rayon) < classement.plancher():
+                break
+            rayon *= 2
+        return self._resultat(classement)
+
+    def _resultat(self, classement):
+        # Colonne par colonne : plus rapide que iloc suivi d'ajouts de colonnes
+        colonnes = {c: self.lignes[c].array.take(classement.lignes) for c in self.lignes.columns}
+        colonnes["similarite"] = classement.similarite
+        if classement.position is not None:
+            colonnes["distance_km"] = classement.distances
+        return pd.DataFrame(colonnes)
+
+
+def _construire(dossier):
+    res = db.executer(f"""
+        SELECT {", ".join(f'"{c}"' for c in COLONNES_LIGNES)},
+               CASE WHEN regexp_matches(plie, '[^ a-z0-9]') THEN NULL ELSE plie END AS nom_plie
+        FROM (SELECT *, {SQL_PLIER} AS plie FROM {config.TABLE_RESTAURANTS} WHERE nom IS NOT NULL)
+    """)
+    return IndexNoms.construire(db.en_dataframe(res, CATEGORIES), dossier)
+
+
+_index = index_disque.IndexVersionne(DOSSIER_INDEX, config.TABLE_RESTAURANTS, _construire, IndexNoms.charger, FORMAT)
+
+
+def index_noms(attendre=True):
+    """Index des noms de la version courante de la table des restaurants (construit ou rouvert).
+
+    Sans ``attendre``, un index qui n'est pas encore en mémoire est préparé
+    en arrière-plan et la fonction renvoie None en attendant.
+    """
+    if not attendre:
+        version = db.version_table(config.TABLE_RESTAURANTS)
+        if not _index.pret(version):
+            prechauffer(f"index_noms_{version}", _index.obtenir)
+            return None
+    return _index.obtenir()
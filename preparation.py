@@ -0,0 +1,102 @@
+"""Préparation des tables au chargement : à relancer après chaque import de données.
+
+Usage : python preparation.py
+
+Chaque table source est réécrite une fois avec :
+- les colonnes texte sans espaces parasites et la notation en DOUBLE ;
+- le niveau de prix codé en entier (prix_code, 1 = Bon marché) ;
+- la cellule spatiale (cellule_geo) ;
+- un tri par (cellule, spécialité) : les filtres de l'application
+  deviennent de simples égalités / intervalles, sans TRIM() ligne à ligne,
+  et la boîte englobante de la recherche par rayon ne lit que les row
+  groups de ses cellules (statistiques min/max).
+"""
+from config import TABLE_CUBE, TABLES_SOURCES
+from cube import construire_cube
+from grille import COLONNE_CELLULE, expression_sql_cellule
+import db
+
+# Niveaux de prix connus, du moins cher au plus cher (sans accents ni majuscules)
+NIVEAUX_PRIX = ["bon marche", "modere", "cher", "tres cher"]
+COLONNES_DERIVEES = ["prix_code", COLONNE_CELLULE]
+# Clés repliées des premières préparations, qu'aucune requête n'utilisait
+COLONNES_OBSOLETES = ["ville_cle", "specialite_cle"]
+# La cellule d'abord : c'est elle qui élague la recherche par rayon
+CLE_DE_TRI = f'{COLONNE_CELLULE}, "spécialité"'
+
+
+def colonnes(con, table_name):
+    return [c[0] for c in con.execute(f"DESCRIBE {table_name}").fetchall()]
+
+
+def _cle_prix(colonne):
+    return f"lower(strip_accents(TRIM({colonne})))"
+
+
+def _cas_prix_connus(colonne):
+    cle = _cle_prix(colonne)
+    return " ".join(f"WHEN {cle} = '{niveau}' THEN {i}" for i, niveau in enumerate(NIVEAUX_PRIX, start=1))
+
+
+def expression_prix_connu(colonne='"niveau de prix (libellé)"'):
+    """Code des niveaux de prix connus, NULL pour les autres libellés."""
+    return f"CAST(CASE {_cas_prix_connus(colonne)} END AS INTEGER)"
+
+
+def expression_prix_code(colonne='"niveau de prix (libellé)"'):
+    cle = _cle_prix(colonne)
+    connus = _cas_prix_connus(colonne)
+    liste_connus = ", ".join(f"'{niveau}'" for niveau in NIVEAUX_PRIX)
+    # Les libellés inconnus sont numérotés à la suite, par ordre alphabétique
+    return f"""CAST(CASE WHEN {colonne} IS NULL THEN NULL {connus}
+        ELSE {len(NIVEAUX_PRIX)} + DENSE_RANK() OVER (
+            ORDER BY CASE WHEN {cle} IN ({liste_connus}) THEN NULL ELSE {cle} END
+        ) END AS INTEGER)"""
+
+
+def normaliser(con, table_name):
+    existantes = [c for c in COLONNES_DERIVEES + COLONNES_OBSOLETES if c in colonnes(con, table_name)]
+    exclusion = f" EXCLUDE ({', '.join(existantes)})" if existantes else ""
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {table_name} AS
+        SELECT
+            *,
+            {expression_prix_code()} AS prix_code,
+            {expression_sql_cellule()} AS {COLONNE_CELLULE}
+        FROM (
+            SELECT *{exclusion} REPLACE (
+                TRIM(ville) AS ville,
+                TRIM("spécialité") AS "spécialité",
+                TRIM("niveau de prix (libellé)") AS "niveau de prix (libellé)",
+                TRY_CAST(notation AS DOUBLE) AS notation,
+                CAST(latitude AS DOUBLE) AS latitude,
+                CAST(longitude AS DOUBLE) AS longitude
+            )
+            FROM {table_name}
+        )
+        ORDER BY {CLE_DE_TRI}
+    """)
+
+
+def _reecrire(con, table_name, ecrire):
+    """``ecrire()`` puis incrément de la version de ``table_name``, dans une même transaction."""
+    con.execute("BEGIN TRANSACTION")
+    try:
+        ecrire()
+        db.nouvelle_version(con, table_name)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+
+def preparer(con):
+    for table_name in TABLES_SOURCES:
+        _reecrire(con, table_name, lambda: normaliser(con, table_name))
+        print(f"✅ {table_name} préparée")
+    _reecrire(con, TABLE_CUBE, lambda: construire_cube(con))
+    print(f"✅ {TABLE_CUBE} construite")
+
+
+if __name__ == "__main__":
+    preparer(db.connexion())
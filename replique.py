@@ -0,0 +1,169 @@
+"""Synchronisation d'une réplique locale des tables MotherDuck.
+
+Usage : python replique.py
+puis lancer l'application avec MIAM_SOURCE=locale.
+
+Une table n'est relue que si son numéro dans la table _versions distante
+(à défaut, son empreinte) a changé depuis la dernière synchronisation, et
+seules les lignes ajoutées ou modifiées traversent alors le réseau : on
+compare les hachages de lignes des deux côtés. Chaque table modifiée voit
+son numéro de version incrémenté dans la table _versions de la réplique.
+
+La synchronisation travaille sur une copie de la réplique, publiée à la fin
+en remplaçant le lien MIAM_REPLIQUE : l'application, qui lit l'ancien
+fichier en lecture seule, n'a pas besoin d'être arrêtée et passe au
+nouveau fichier à sa prochaine vérification de version (voir db.py).
+"""
+import glob
+import os
+import shutil
+import time
+
+import duckdb
+
+import config
+from db import TABLE_VERSIONS, creer_table_versions, empreinte, version_enregistree
+from grille import COLONNE_CELLULE
+from preparation import CLE_DE_TRI, colonnes
+
+# Au-delà de cette part de lignes modifiées, la table est recopiée entière
+PART_COPIE_COMPLETE = 0.5
+
+
+def _cle_de_tri(con, table_name):
+    # Même ordre physique que celui donné par preparation.py
+    if COLONNE_CELLULE in colonnes(con, table_name):
+        return CLE_DE_TRI
+    return 'ville, "spécialité"'
+
+
+def _copier(con, table_name):
+    con.execute(f"""
+        CREATE OR REPLACE TABLE replique.{table_name} AS
+        SELECT * FROM {table_name}
+        ORDER BY {_cle_de_tri(con, table_name)}
+    """)
+
+
+def _mettre_a_jour(con, table_name):
+    """Applique à la réplique les lignes ajoutées, modifiées ou supprimées ; renvoie le nombre de lignes copiées."""
+    # Seuls les hachages des lignes distantes sont transférés
+    con.execute(f"CREATE OR REPLACE TEMP TABLE _hachages AS SELECT hash(t) AS h FROM {table_name} t")
+    nouvelles = [h for (h,) in con.execute(
+        f"SELECT h FROM _hachages EXCEPT SELECT hash(t) FROM replique.{table_name} t"
+    ).fetchall()]
+    total = con.execute("SELECT COUNT(*) FROM _hachages").fetchone()[0]
+    if len(nouvelles) > total * PART_COPIE_COMPLETE:
+        _copier(con, table_name)
+        return total
+
+    supprimees = con.execute(
+        f"DELETE FROM replique.{table_name} t WHERE hash(t) NOT IN (SELECT h FROM _hachages)"
+    ).fetchone()[0]
+    if nouvelles:
+        con.execute(
+            f"INSERT INTO replique.{table_name} SELECT * FROM {table_name} t WHERE hash(t) IN (SELECT UNNEST(?::UBIGINT[]))",
+            (nouvelles,)
+        )
+    # Lignes en double : les ensembles de hachages ne suffisent plus
+    if con.execute(f"SELECT COUNT(*) FROM replique.{table_name}").fetchone()[0] != total:
+        _copier(con, table_name)
+        return total
+    if nouvelles or supprimees:
+        # Le tri physique (statistiques min/max des row groups) est refait en local
+        con.execute(f"""
+            CREATE OR REPLACE TABLE replique.{table_name} AS
+            SELECT * FROM replique.{table_name}
+            ORDER BY {_cle_de_tri(con, table_name)}
+        """)
+    return len(nouvelles)
+
+
+def _synchroniser_table(con, table_name, existantes):
+    """Met à jour une table de la réplique attachée ; renvoie (version, modifiée)."""
+    marqueur = version_enregistree(con, table_name) or empreinte(table_name, con)
+    ligne = con.execute(
+        f"SELECT empreinte, version FROM replique.{TABLE_VERSIONS} WHERE table_name = ?",
+        (table_name,)
+    ).fetchone()
+    if ligne and ligne[0] == marqueur:
+        print(f"= {table_name} inchangée (version {ligne[1]})")
+        return ligne[1], False
+
+    if table_name in existantes and colonnes(con, table_name) == colonnes(con, f"replique.{table_name}"):
+        copiees = _mettre_a_jour(con, table_name)
+    else:
+        _copier(con, table_name)
+        copiees = con.execute(f"SELECT COUNT(*) FROM replique.{table_name}").fetchone()[0]
+    version = ligne[1] + 1 if ligne else 1
+    con.execute(
+        f"INSERT OR REPLACE INTO replique.{TABLE_VERSIONS} VALUES (?, ?, ?, current_timestamp)",
+        (table_name, marqueur, version)
+    )
+    print(f"✅ {table_name} : {copiees} lignes copiées (version {version})")
+    return version, True
+
+
+def _publier(chemin, fichier):
+    """Fait pointer ``chemin`` vers ``fichier`` d'un seul coup (renommage d'un lien)."""
+    lien = f"{chemin}.lien"
+    if os.path.lexists(lien):
+        os.remove(lien)
+    try:
+        os.symlink(os.path.basename(fichier), lien)
+    except OSError:
+        # Pas de liens symboliques (Windows sans droits) : remplacement du
+        # fichier, l'application doit alors être arrêtée
+        os.replace(fichier, chemin)
+        return
+    os.replace(lien, chemin)
+
+
+def _purger(chemin, garder):
+    # Les répliques plus anciennes que la précédente ne sont plus lues
+    garder = {os.path.realpath(f) for f in garder if f is not None}
+    for fichier in glob.glob(f"{glob.escape(chemin)}.*"):
+        base = fichier.removesuffix(".wal")
+        if base[len(chemin) + 1:].isdigit() and os.path.realpath(base) not in garder:
+            os.remove(fichier)
+
+
+def synchroniser(chemin=config.CHEMIN_REPLIQUE, tables=config.TABLES, con=None):
+    """Met à jour la réplique locale et renvoie {table: version}."""
+    if con is None:
+        con = duckdb.connect(config.chemin_motherduck())
+    if os.path.dirname(chemin):
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    actuel = os.path.realpath(chemin) if os.path.exists(chemin) else None
+    fichier = f"{chemin}.{time.time_ns()}"
+    if actuel is not None:
+        # Copie locale de la réplique courante, que l'application continue de lire
+        shutil.copyfile(actuel, fichier)
+
+    con.execute(f"ATTACH '{fichier}' AS replique")
+    try:
+        creer_table_versions(con, "replique.")
+        existantes = {t[0] for t in con.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE database_name = 'replique'"
+        ).fetchall()}
+        versions, modifiee = {}, False
+        for table_name in tables:
+            versions[table_name], copiee = _synchroniser_table(con, table_name, existantes)
+            modifiee = modifiee or copiee
+        con.execute("CHECKPOINT replique")
+    except BaseException:
+        con.execute("DETACH replique")
+        os.remove(fichier)
+        raise
+    con.execute("DETACH replique")
+
+    if not modifiee:
+        os.remove(fichier)
+        return versions
+    _publier(chemin, fichier)
+    _purger(chemin, {fichier, actuel})
+    return versions
+
+
+if __name__ == "__main__":
+    synchroniser()
@@ -0,0 +1,201 @@
+"""Service HTTP/JSON de recherche de restaurants, sans Streamlit.
+
+Usage : python service.py [--hote 127.0.0.1] [--port 8000] [--threads 8]
+
+Routes (GET) :
+  /recherche?specialite=&prix=&note_min=&lat=&lon=&rayon=&page=&taille=
+  /villes?nom=Lyon
+  /vocabulaires
+  /sante
+
+Les requêtes sont traitées par un pool de ``--threads`` threads : chacun
+garde son curseur DuckDB (voir db.curseur), ce qui fait du pool un pool
+de connexions sur la connexion partagée du processus. Les réponses sont
+mises en cache sur les paramètres normalisés et la version de la table.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import math
+import os
+import urllib.parse
+
+from cache import CacheTTL
+import db
+import moteur
+
+TAILLE_PAGE = 50
+TAILLE_PAGE_MAX = 200
+# Les positions sont arrondies à 4 décimales (une dizaine de mètres)
+DECIMALES_POSITION = 4
+COLONNES_REPONSE = ["nom", "ville", "spécialité", "niveau de prix (libellé)", "notation", "latitude", "longitude"]
+
+_journal = logging.getLogger("miam.service")
+
+# Réponses JSON déjà encodées, partagées par tous les threads
+cache_reponses = CacheTTL(
+    duree_vie=int(os.getenv("MIAM_SERVICE_CACHE_TTL", "60")),
+    budget_octets=int(os.getenv("MIAM_SERVICE_CACHE_MO", "64")) * 1024 * 1024,
+)
+
+
+class ParametreInvalide(ValueError):
+    pass
+
+
+def _nombre(params, nom, defaut=None, minimum=None, maximum=None, entier=False):
+    valeur = params.get(nom)
+    if valeur is None:
+        return defaut
+    try:
+        valeur = int(valeur) if entier else float(valeur)
+    except ValueError:
+        raise ParametreInvalide(f"{nom} doit être un nombre") from None
+    if not math.isfinite(valeur) or (minimum is not None and valeur < minimum) or (maximum is not None and valeur > maximum):
+        raise ParametreInvalide(f"{nom} hors des bornes [{minimum}, {maximum}]")
+    return valeur
+
+
+def normaliser_recherche(brut):
+    """Paramètres de /recherche validés, avec leurs valeurs par défaut ; sert aussi de clé de cache."""
+    params = {nom: valeurs[-1].strip() for nom, valeurs in brut.items() if valeurs and valeurs[-1].strip()}
+    specialites, codes_prix = moteur.vocabulaires()
+    specialite = params.get("specialite")
+    if specialite is not None and specialite not in specialites:
+        raise ParametreInvalide(f"spécialité inconnue : {specialite}")
+    prix = params.get("prix")
+    if prix is not None and prix not in codes_prix:
+        raise ParametreInvalide(f"prix inconnu : {prix} (valeurs : {', '.join(codes_prix)})")
+
+    lat = _nombre(params, "lat", minimum=-90, maximum=90)
+    lon = _nombre(params, "lon", minimum=-180, maximum=180)
+    if (lat is None) != (lon is None):
+        raise ParametreInvalide("lat et lon vont ensemble")
+    position = None if lat is None else (round(lat, DECIMALES_POSITION), round(lon, DECIMALES_POSITION))
+    return {
+        "specialite": specialite,
+        "prix_code": None if prix is None else codes_prix[prix],
+        "note_min": _nombre(params, "note_min", minimum=0, maximum=5),
+        "position": position,
+        "rayon": None if position is None else _nombre(params, "rayon", 10, minimum=0, maximum=moteur.RAYON_MAX),
+        "page": _nombre(params, "page", 1, minimum=1, entier=True),
+        "taille": _nombre(params, "taille", TAILLE_PAGE, minimum=1, maximum=TAILLE_PAGE_MAX, entier=True),
+    }
+
+
+def reponse_recherche(params):
+    data = moteur.rechercher(
+        params["specialite"], params["prix_code"], params["note_min"], params["position"], params["rayon"],
+    )
+    debut = (params["page"] - 1) * params["taille"]
+    colonnes = COLONNES_REPONSE + (["distance_km"] if "distance_km" in data.columns else [])
+    page = data.iloc[debut:debut + params["taille"]][colonnes]
+    resultats = page.to_json(orient="records", force_ascii=False, double_precision=6)
+    return (
+        f'{{"total": {len(data)}, "page": {params["page"]}, "taille": {params["taille"]}, '
+        f'"resultats": {resultats}}}'
+    )
+
+
+def reponse_ville(brut):
+    nom = (brut.get("nom") or [""])[-1].strip()
+    if not nom:
+        raise ParametreInvalide("paramètre nom manquant")
+    stats = moteur.statistiques_ville(nom)
+    if stats is None:
+        return None
+    return json.dumps(stats, ensure_ascii=False, default=lambda v: v.item())
+
+
+def reponse_vocabulaires():
+    specialites, codes_prix = moteur.vocabulaires()
+    return json.dumps({"specialites": specialites, "prix": list(codes_prix)}, ensure_ascii=False)
+
+
+class Gestionnaire(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Une connexion inactive libère son thread du pool au bout de ce délai (s)
+    timeout = 5
+    # En-têtes et corps partent sans attendre l'accusé de réception
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        brut = urllib.parse.parse_qs(url.query)
+        try:
+            if url.path == "/sante":
+                self._envoyer(200, json.dumps({"ok": True, "version": db.version_table(moteur.TABLE)}))
+            elif url.path == "/recherche":
+                params = normaliser_recherche(brut)
+                self._reponse_en_cache(("recherche", tuple(params.items())), lambda: reponse_recherche(params))
+            elif url.path == "/villes":
+                self._reponse_en_cache(("villes", (brut.get("nom") or [""])[-1].strip().lower()), lambda: reponse_ville(brut))
+            elif url.path == "/vocabulaires":
+                self._reponse_en_cache(("vocabulaires",), reponse_vocabulaires)
+            else:
+                self._envoyer(404, json.dumps({"erreur": f"route inconnue : {url.path}"}))
+        except ParametreInvalide as erreur:
+            self._envoyer(400, json.dumps({"erreur": str(erreur)}, ensure_ascii=False))
+        except Exception:
+            _journal.exception("erreur sur %s", self.path)
+            self._envoyer(500, json.dumps({"erreur": "erreur interne"}))
+
+    def _reponse_en_cache(self, cle, calculer):
+        # Une nouvelle version de la table rend les anciennes réponses inaccessibles
+        cle = (db.version_table(moteur.TABLE), cle)
+        corps = cache_reponses.get(cle)
+        if corps is None:
+            texte = calculer()
+            if texte is None:
+                self._envoyer(404, json.dumps({"erreur": "introuvable"}))
+                return
+            corps = texte.encode("utf-8")
+            cache_reponses.put(cle, corps, taille=len(corps))
+        self._envoyer(200, corps)
+
+    def _envoyer(self, statut, corps):
+        if isinstance(corps, str):
+            corps = corps.encode("utf-8")
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        _journal.debug("%s - %s", self.address_string(), format % args)
+
+
+class Serveur(ThreadingHTTPServer):
+    """Serveur HTTP dont les requêtes sont traitées par un pool de threads borné."""
+
+    def __init__(self, adresse, nb_threads=8):
+        super().__init__(adresse, Gestionnaire)
+        self._pool = ThreadPoolExecutor(max_workers=nb_threads, thread_name_prefix="miam-service")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serveur = Serveur((args.hote, args.port), args.threads)
+    print(f"Service à l'écoute sur http://{args.hote}:{serveur.server_port}")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.generateur import generer
+import config
+import db
+
+
+def _oublier_connexion():
+    db.reconnecter()
+    db._versions.clear()
+    db.cache.vider()
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    """Petite base synthétique préparée, utilisée comme réplique locale."""
+    chemin = generer(2000, str(tmp_path / "miam.duckdb"))
+    monkeypatch.setattr(config, "SOURCE", "locale")
+    monkeypatch.setattr(config, "CHEMIN_REPLIQUE", chemin)
+    _oublier_connexion()
+    yield chemin
+    _oublier_connexion()
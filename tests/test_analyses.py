@@ -0,0 +1,29 @@
+import os
+
+import duckdb
+from streamlit.testing.v1 import AppTest
+
+import config
+import db
+import graphiques
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages", "Analyses.py")
+
+
+def test_page_analyses_sans_table_du_cube(base):
+    # Base importée mais jamais préparée : ni cube ni numéro de version du cube
+    db.connexion().close()
+    db.reconnecter()
+    con = duckdb.connect(base)
+    con.execute(f"DROP TABLE {config.TABLE_CUBE}")
+    con.execute(f"DELETE FROM {db.TABLE_VERSIONS} WHERE table_name = ?", (config.TABLE_CUBE,))
+    con.close()
+    db._versions.clear()
+    graphiques.cache_figures.vider()
+
+    page = AppTest.from_file(PAGE, default_timeout=60).run()
+    assert not page.exception
+    assert "2000" in page.info[0].value
+    # Toutes les sections sont affichées, sans sélecteur
+    assert not page.radio
+    assert len(page.subheader) == 6
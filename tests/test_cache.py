@@ -0,0 +1,92 @@
+import time
+
+import pandas as pd
+
+import cache
+from cache import CacheTTL, taille_estimee
+import config
+import db
+
+
+class Horloge:
+    def __init__(self):
+        self.maintenant = 1000.0
+
+    def __call__(self):
+        return self.maintenant
+
+
+def test_expiration(monkeypatch):
+    horloge = Horloge()
+    monkeypatch.setattr(cache.time, "monotonic", horloge)
+    c = CacheTTL(duree_vie=10)
+    c.put("a", 1, taille=1)
+    c.put("b", 2, taille=1, duree_vie=30)
+    horloge.maintenant += 11
+    assert c.get("a") is None
+    assert c.get("b") == 2
+    assert c.statistiques()["entrees"] == 1
+    assert c.octets == 1
+
+
+def test_ordre_lru_et_nombre_d_entrees():
+    c = CacheTTL(max_entrees=2)
+    c.put("a", 1, taille=1)
+    c.put("b", 2, taille=1)
+    # Lire « a » le rend le plus récent : « b » part en premier
+    assert c.get("a") == 1
+    c.put("c", 3, taille=1)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.statistiques()["evictions"] == 1
+
+
+def test_budget_memoire():
+    c = CacheTTL(budget_octets=100)
+    for cle in "abcd":
+        c.put(cle, cle, taille=20)
+    c.put("e", "e", taille=25)
+    # 105 octets : la plus ancienne entrée est retirée
+    assert c.get("a") is None
+    assert [c.get(cle) for cle in "bcde"] == list("bcde")
+    assert c.octets == 85
+    # Remplacer une entrée ne compte pas deux fois sa taille
+    c.put("b", "b", taille=10)
+    assert c.octets == 75
+
+
+def test_entree_trop_grosse_refusee():
+    c = CacheTTL(budget_octets=100)
+    c.put("gros", "x", taille=26)
+    assert c.get("gros") is None
+    assert c.octets == 0
+    c.put("moyen", "x", taille=25)
+    assert c.get("moyen") == "x"
+
+
+def test_compteurs():
+    c = CacheTTL()
+    c.get("a")
+    c.put("a", 1, taille=1)
+    c.get("a")
+    c.get("a")
+    assert {k: c.statistiques()[k] for k in ("hits", "misses")} == {"hits": 2, "misses": 1}
+
+
+def test_taille_estimee():
+    df = pd.DataFrame({"a": range(1000)})
+    assert taille_estimee(df) >= 8000
+    assert taille_estimee([(1, "abc"), (2, "def")]) > taille_estimee([])
+
+
+def test_requete_cle_sur_la_version_de_la_table(base):
+    sql = f"SELECT COUNT(*) FROM {config.TABLE_RESTAURANTS}"
+    db.cache.vider()
+    misses = db.cache.misses
+    assert db.requete(sql, mode="one") == (2000,)
+    assert db.requete(sql, mode="one") == (2000,)
+    assert db.cache.misses == misses + 1
+    # Nouvelle version de la table : l'ancien résultat n'est plus servi
+    db._versions[config.TABLE_RESTAURANTS] = ("v999", time.monotonic())
+    assert db.requete(sql, mode="one") == (2000,)
+    assert db.cache.misses == misses + 2
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from candidats import Candidats, candidats_session
+from distances import distances_km
+
+POSITION = (45.764, 4.8357)
+
+
+def _donnees():
+    aleatoire = np.random.default_rng(0)
+    data = pd.DataFrame({
+        "nom": [f"R{i}" for i in range(200)],
+        "latitude": POSITION[0] + aleatoire.uniform(-0.3, 0.3, 200),
+        "longitude": POSITION[1] + aleatoire.uniform(-0.4, 0.4, 200),
+        "notation": aleatoire.uniform(3, 5, 200).round(1),
+    })
+    data.loc[[3, 7], "latitude"] = np.nan
+    data.loc[[10, 11, 12], "notation"] = np.nan
+    return data
+
+
+def test_tries_par_distance_sans_coordonnees_manquantes():
+    data = _donnees()
+    candidats = Candidats(data, POSITION)
+    assert len(candidats) == 198
+    assert not {"R3", "R7"} & set(candidats.data["nom"])
+    assert np.all(np.diff(candidats.distances) >= 0)
+    attendues = distances_km(*POSITION, candidats.data["latitude"], candidats.data["longitude"])
+    np.testing.assert_allclose(candidats.data["distance_km"], attendues)
+
+
+def test_rayon_inclut_la_borne():
+    candidats = Candidats(_donnees(), POSITION)
+    rayon = float(candidats.distances[49])
+    assert len(candidats.filtrer(rayon)) == 50
+    assert len(candidats.filtrer(np.nextafter(rayon, 0))) == 49
+    assert len(candidats.filtrer(0)) == 0
+    assert len(candidats.filtrer(1e6)) == 198
+
+
+def test_note_minimale_exclut_les_notes_manquantes():
+    candidats = Candidats(_donnees(), POSITION)
+    sans_note = {"R10", "R11", "R12"}
+    assert sans_note <= set(candidats.filtrer(1e6)["nom"])
+    resultat = candidats.filtrer(1e6, note_min=3.0)
+    assert not sans_note & set(resultat["nom"])
+    assert len(resultat) == 195
+    assert (candidats.filtrer(20, note_min=4.5)["notation"] >= 4.5).all()
+
+
+def test_session_reconstruite_quand_la_cle_change():
+    session, chargements = {}, []
+
+    def charger():
+        chargements.append(1)
+        return _donnees()
+
+    premier = candidats_session(session, ("v1", POSITION, "Toutes"), charger, POSITION)
+    assert candidats_session(session, ("v1", POSITION, "Toutes"), charger, POSITION) is premier
+    assert len(chargements) == 1
+    second = candidats_session(session, ("v2", POSITION, "Toutes"), charger, POSITION)
+    assert second is not premier
+    assert len(chargements) == 2
@@ -0,0 +1,55 @@
+import carte
+import config
+import db
+
+LYON = (45.764, 4.8357)
+
+
+def _nombre(note_min, centre=None, zoom=None):
+    query = f"SELECT COUNT(*) FROM {config.TABLE_ANALYSES} WHERE notation >= ? AND latitude IS NOT NULL AND longitude IS NOT NULL"
+    params = [note_min]
+    if centre is not None:
+        query += " AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+        params += list(carte.fenetre(centre, zoom))
+    return db.requete(query, params, mode="one")[0]
+
+
+def test_points_jusqu_au_seuil_puis_groupes(base, monkeypatch):
+    nombre = _nombre(4.0)
+    assert nombre > 100
+
+    monkeypatch.setattr(carte, "SEUIL_POINTS", nombre)
+    type_, data = carte.donnees_carte(6, note_min=4.0)
+    assert type_ == "points"
+    assert len(data) == nombre
+
+    monkeypatch.setattr(carte, "SEUIL_POINTS", nombre - 1)
+    type_, data = carte.donnees_carte(6, note_min=4.0)
+    assert type_ == "groupes"
+    assert data["nombre"].sum() == nombre
+
+
+def test_groupes_plafonnes(base, monkeypatch):
+    monkeypatch.setattr(carte, "SEUIL_POINTS", 10)
+    nombre = _nombre(0)
+    for max_marqueurs in (1, 5, 40):
+        monkeypatch.setattr(carte, "MAX_MARQUEURS", max_marqueurs)
+        # Au zoom 12, une case par restaurant ou presque : le pas doit doubler
+        type_, data = carte.donnees_carte(12, note_min=0)
+        assert type_ == "groupes"
+        assert 1 <= len(data) <= max_marqueurs
+        assert data["nombre"].sum() == nombre
+
+
+def test_fenetre_autour_du_centre(base, monkeypatch):
+    monkeypatch.setattr(carte, "SEUIL_POINTS", 10)
+    monkeypatch.setattr(carte, "MAX_MARQUEURS", 20)
+    nombre = _nombre(0, LYON, 9)
+    assert nombre > 10
+    type_, data = carte.donnees_carte(9, LYON, note_min=0)
+    assert type_ == "groupes"
+    assert len(data) <= 20
+    assert data["nombre"].sum() == nombre
+    lat_min, lat_max, lon_min, lon_max = carte.fenetre(LYON, 9)
+    assert data["latitude"].between(lat_min, lat_max).all()
+    assert data["longitude"].between(lon_min, lon_max).all()
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from chat import Automate, MoteurChat, replier
+
+
+@pytest.fixture(scope="module")
+def moteur():
+    stats = pd.DataFrame(
+        [
+            ("Lyon", "Lyonnaise", "Modéré", 30, 135.0, 30),
+            ("Lyon", "Pizza", "Bon marché", 10, 42.0, 10),
+            ("Aix-en-Provence", "Provençale", "Cher", 5, 22.5, 5),
+            ("Aix", "Crêperie", "Bon marché", 2, 0.0, 0),
+            ("La Rochelle", "Fruits de mer", "Modéré", 8, 36.0, 8),
+            ("Saint-Étienne", "Bistrot", "Modéré", 4, 16.0, 4),
+            ("Paris", None, "Cher", 3, 12.0, 3),
+        ],
+        columns=["ville", "spécialité", "prix", "nombre", "somme_notation", "nb_notation"],
+    )
+    return MoteurChat(stats)
+
+
+def test_replier():
+    assert replier("  Saint-Étienne l’Été  ") == "saint etienne l ete"
+    assert replier("AIX-EN-PROVENCE") == "aix en provence"
+
+
+def test_automate_trouve_toutes_les_occurrences():
+    automate = Automate({"he": 1, "she": 2, "hers": 3, "his": 4})
+    assert sorted(automate.occurrences("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 3)]
+    assert automate.occurrences("xyz") == []
+
+
+def test_accents_et_tirets(moteur):
+    assert moteur.villes_mentionnees("Restaurants à SAINT ETIENNE ?") == ["saint etienne"]
+    assert moteur.villes_mentionnees("et à aix en provence") == ["aix en provence"]
+
+
+def test_la_plus_longue_sans_chevauchement(moteur):
+    # « aix » est contenu dans « aix en provence » : seule la plus longue compte
+    assert moteur.villes_mentionnees("Aix-en-Provence") == ["aix en provence"]
+    assert moteur.villes_mentionnees("Aix puis Aix-en-Provence") == ["aix", "aix en provence"]
+
+
+def test_mots_entiers(moteur):
+    assert moteur.villes_mentionnees("La cuisine lyonnaise est la meilleure") == []
+    assert moteur.villes_mentionnees("Parisien ou Lyonnais ?") == []
+
+
+def test_plusieurs_villes_dans_l_ordre(moteur):
+    assert moteur.villes_mentionnees("Paris, Lyon ou La Rochelle ? Et Lyon encore") == ["paris", "lyon", "la rochelle"]
+
+
+@pytest.mark.parametrize("question, attendues", [
+    ("Quelle est la note moyenne à Lyon ?", ["note"]),
+    ("Les restaurants les mieux notés", ["note"]),
+    ("Combien de restaurants à Lyon ?", ["nombre"]),
+    ("C'est cher à Paris ?", ["prix"]),
+    ("Quel type de cuisine à Lyon ?", ["specialite"]),
+    ("Parle-moi de Lyon", ["specialite"]),
+    ("Combien et quel prix ?", ["prix", "nombre"]),
+])
+def test_intentions(question, attendues):
+    assert MoteurChat.intentions(question) == attendues
+
+
+def test_reponses(moteur):
+    assert "Lyonnaise" in moteur.repondre("Quel est le type de cuisine le plus courant à Lyon ?")
+    assert "**40**" in moteur.repondre("Combien de restaurants à Lyon ?")
+    assert "4.42" in moteur.repondre("Note moyenne à Lyon ?")
+    assert "Aucune note" in moteur.repondre("Note moyenne à Aix ?")
+    assert "aucune spécialité" in moteur.repondre("Cuisine à Paris ?")
+    reponse = moteur.repondre("Combien de restaurants à Paris et à Lyon ?")
+    assert reponse.index("Paris") < reponse.index("Lyon")
+    assert "pas détecté de ville" in moteur.repondre("Où manger ?")
@@ -0,0 +1,33 @@
+import threading
+
+import config
+import db
+
+
+def test_reconnecter_laisse_finir_les_curseurs_des_autres_threads(base):
+    pret, reconnecte = threading.Event(), threading.Event()
+    resultats = []
+
+    def requete_longue():
+        cur = db.curseur()
+        pret.set()
+        reconnecte.wait(5)
+        # Le curseur ouvert avant la reconnexion reste utilisable
+        resultats.append(cur.execute(f"SELECT COUNT(*) FROM {config.TABLE_RESTAURANTS}").fetchone()[0])
+
+    fil = threading.Thread(target=requete_longue)
+    fil.start()
+    pret.wait(5)
+    db.reconnecter()
+    reconnecte.set()
+    fil.join(5)
+    assert resultats == [2000]
+
+
+def test_curseur_suit_la_nouvelle_connexion(base):
+    avant = db.curseur()
+    db.reconnecter()
+    apres = db.curseur()
+    assert apres is not avant
+    assert apres.execute("SELECT 1").fetchone() == (1,)
+    assert avant.execute("SELECT 1").fetchone() == (1,)
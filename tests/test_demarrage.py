@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+import chat
+import demarrage
+import geocodage
+import instrumentation
+
+
+def test_resultat_delai_depasse_renvoie_le_defaut():
+    taches = demarrage.Demarrage()
+    taches.lancer("lente", time.sleep, 0.5)
+    assert taches.resultat("lente", 0.01, defaut="repli") == "repli"
+
+
+def test_resultat_releve_les_erreurs_de_la_tache():
+    def echouer():
+        raise LookupError("table absente")
+
+    taches = demarrage.Demarrage()
+    taches.lancer("erreur", echouer)
+    with pytest.raises(LookupError):
+        taches.resultat("erreur", 5, defaut="repli")
+
+
+def test_geocodage_en_echec_renvoie_le_defaut(monkeypatch):
+    def ville_proche(lat, lon):
+        raise OSError("disque en lecture seule")
+
+    monkeypatch.setattr(geocodage, "ville_proche", ville_proche)
+    taches = demarrage.Demarrage()
+    taches.lancer("geocodage", geocodage.ville_proche, 45.76, 4.83)
+    assert taches.resultat("geocodage", 5, facultatif=True) is None
+
+
+def test_threads_du_pool_detaches_apres_la_tache(monkeypatch):
+    monkeypatch.setattr(demarrage, "rerun_courant", instrumentation.Rerun)
+    taches = demarrage.Demarrage()
+    for i in range(demarrage.NB_THREADS * 2):
+        taches.lancer(f"tache{i}", time.sleep, 0.01)
+    for i in range(demarrage.NB_THREADS * 2):
+        taches.resultat(f"tache{i}", 5)
+    # Les préchauffages suivants ne journalisent pas dans la session précédente
+    suivantes = [demarrage._pool.submit(instrumentation.rerun_courant) for _ in range(demarrage.NB_THREADS * 4)]
+    assert all(t.result(5) is None for t in suivantes)
+
+
+def test_prechauffer_une_fois_par_processus(monkeypatch):
+    monkeypatch.setattr(demarrage, "_prechauffages", {})
+    appels = []
+    premiere = demarrage.prechauffer("essai", appels.append, 1)
+    premiere.result(5)
+    assert demarrage.prechauffer("essai", appels.append, 2) is premiere
+    assert appels == [1]
+
+
+def test_prechauffage_en_echec_relance(monkeypatch):
+    monkeypatch.setattr(demarrage, "_prechauffages", {})
+    tache = demarrage.prechauffer("echec", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        tache.result(5)
+    time.sleep(0.05)
+    assert demarrage.prechauffer("echec", lambda: 1).result(5) == 1
+
+
+@pytest.mark.parametrize("module, fonction, classe", [
+    (chat, "moteur", "MoteurChat"),
+    (geocodage, "index_villes", "IndexVilles"),
+])
+def test_construction_unique_depuis_plusieurs_threads(base, monkeypatch, module, fonction, classe):
+    monkeypatch.setattr(module, "_moteur" if module is chat else "_index", None)
+    origine = getattr(module, classe)
+    constructions = []
+
+    def construire(*args):
+        constructions.append(threading.get_ident())
+        time.sleep(0.05)
+        return origine(*args)
+
+    monkeypatch.setattr(module, classe, construire)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        resultats = list(pool.map(lambda _: getattr(module, fonction)(), range(8)))
+    assert len(constructions) == 1
+    assert all(r is resultats[0] for r in resultats)
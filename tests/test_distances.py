@@ -0,0 +1,42 @@
+import numpy as np
+from geopy.distance import geodesic
+
+from distances import boite_englobante, distances_km
+
+
+def test_distances_proches_de_geodesic():
+    aleatoire = np.random.default_rng(0)
+    lat, lon = 45.764, 4.8357
+    latitudes = lat + aleatoire.uniform(-1, 1, 500)
+    longitudes = lon + aleatoire.uniform(-1.5, 1.5, 500)
+
+    calculees = distances_km(lat, lon, latitudes, longitudes)
+    attendues = np.array([geodesic((lat, lon), (a, b)).km for a, b in zip(latitudes, longitudes)])
+    # Moins de 2 m d'écart sur des distances de l'ordre de 100 km
+    assert np.abs(calculees - attendues).max() < 0.002
+
+
+def test_distances_paires_quelconques():
+    aleatoire = np.random.default_rng(1)
+    for _ in range(200):
+        lat1, lat2 = aleatoire.uniform(-80, 80, 2)
+        lon1, lon2 = aleatoire.uniform(-180, 180, 2)
+        calculee = distances_km(lat1, lon1, [lat2], [lon2])[0]
+        # Lambert reste à quelques dizaines de mètres près sur des milliers de km
+        assert abs(calculee - geodesic((lat1, lon1), (lat2, lon2)).km) < 0.1
+
+
+def test_point_confondu_et_coordonnees_manquantes():
+    resultat = distances_km(45.0, 5.0, [45.0, np.nan], [5.0, 5.0])
+    assert resultat[0] == 0
+    assert np.isnan(resultat[1])
+
+
+def test_boite_englobante_contient_le_cercle():
+    lat, lon, rayon = 48.8566, 2.3522, 20
+    lat_min, lat_max, lon_min, lon_max = boite_englobante(lat, lon, rayon)
+    angles = np.linspace(0, 360, 72, endpoint=False)
+    for angle in angles:
+        point = geodesic(kilometers=rayon).destination((lat, lon), angle)
+        assert lat_min <= point.latitude <= lat_max
+        assert lon_min <= point.longitude <= lon_max
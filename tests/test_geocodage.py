@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import geocodage
+
+
+@pytest.fixture
+def cache_vide(base, tmp_path, monkeypatch):
+    monkeypatch.setattr(geocodage, "CHEMIN_CACHE", str(tmp_path / "geocodage.jsonl"))
+    monkeypatch.setattr(geocodage, "_cache", None)
+    monkeypatch.setattr(geocodage, "_echecs", {})
+    monkeypatch.setattr(geocodage, "_index", None)
+    return tmp_path / "geocodage.jsonl"
+
+
+def test_ville_connue_ajoutee_au_journal(cache_vide):
+    assert geocodage.ville_proche(45.76, 4.83) == "Lyon"
+    assert geocodage.ville_proche(48.85, 2.35) == "Paris"
+    lignes = cache_vide.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(l)[1] for l in lignes] == ["Lyon", "Paris"]
+
+    # Relu depuis le disque par un nouveau processus
+    geocodage._cache = None
+    assert geocodage._charger_cache() == {json.loads(l)[0]: json.loads(l)[1] for l in lignes}
+
+
+def test_erreur_nominatim_non_mise_en_cache(cache_vide, monkeypatch):
+    appels = []
+    monkeypatch.setattr(geocodage, "NOMINATIM", True)
+    monkeypatch.setattr(geocodage, "_nominatim", lambda lat, lon: appels.append(1) or (None, False))
+    # Loin de toute ville connue
+    assert geocodage.ville_proche(0.0, 0.0) is None
+    assert geocodage.ville_proche(0.0, 0.0) is None
+    assert appels == [1]
+    assert not cache_vide.exists()
+
+    # Délai écoulé : Nominatim est réinterrogé et sa réponse gardée
+    monkeypatch.setattr(geocodage, "DUREE_ECHEC", 0)
+    monkeypatch.setattr(geocodage, "_nominatim", lambda lat, lon: ("Nulle-part", True))
+    assert geocodage.ville_proche(0.0, 0.0) == "Nulle-part"
+    assert len(cache_vide.read_text(encoding="utf-8").splitlines()) == 1
+
+
+def test_journal_compacte(cache_vide, monkeypatch):
+    monkeypatch.setattr(geocodage, "MAX_ENTREES_CACHE", 3)
+    for i in range(10):
+        geocodage.ville_proche(45.70 + i / 100, 4.83)
+    lignes = cache_vide.read_text(encoding="utf-8").splitlines()
+    assert len(lignes) <= 2 * 3
+    assert len(geocodage._cache) == 3
@@ -0,0 +1,28 @@
+import numpy as np
+
+from benchmarks.generateur import VILLES
+import db
+from distances import distances_km
+import moteur
+
+
+def _dans_le_cercle(data, position, rayon):
+    distances = distances_km(position[0], position[1], data["latitude"], data["longitude"])
+    return set(data["nom"][distances <= rayon])
+
+
+def test_boite_sans_perte_face_au_parcours_complet(base):
+    query, params = moteur.requete_filtres()
+    tous = db.requete(query, params)
+    aleatoire = np.random.default_rng(0)
+    for _ in range(100):
+        _, lat, lon, _ = VILLES[aleatoire.integers(len(VILLES))]
+        position = (lat + aleatoire.uniform(-0.3, 0.3), lon + aleatoire.uniform(-0.4, 0.4))
+        # Une position sur quatre posée sur un bord de cellule
+        if aleatoire.random() < 0.25:
+            position = (round(position[0], 1), round(position[1], 1))
+        rayon = aleatoire.uniform(0.2, moteur.RAYON_MAX)
+        candidats = moteur.charger_candidats(position, rayon_max=rayon)
+        attendus = _dans_le_cercle(tous, position, rayon)
+        assert attendus <= set(candidats["nom"])
+        assert _dans_le_cercle(candidats, position, rayon) == attendus
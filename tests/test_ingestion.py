@@ -0,0 +1,101 @@
+import os
+
+import duckdb
+import pytest
+
+import config
+from cube import charger_cube
+import db
+import ingestion
+
+DOSSIER_EXEMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exemples")
+EXEMPLES = os.path.join(DOSSIER_EXEMPLES, "restaurants.jsonl")
+YELP = os.path.join(DOSSIER_EXEMPLES, "yelp_bordeaux.json")
+GOOGLE = os.path.join(DOSSIER_EXEMPLES, "google_nice.json")
+
+
+def _importer(base, chemins):
+    # L'application lit la base en lecture seule : connexion libérée pendant l'import
+    db.connexion().close()
+    db.reconnecter()
+    con = duckdb.connect(base)
+    try:
+        return ingestion.importer(chemins, con)
+    finally:
+        con.close()
+
+
+def test_import_publie_le_nouveau_cube(base):
+    avant = charger_cube()
+    version_avant = db.version_table(config.TABLE_CUBE)
+
+    compteurs = _importer(base, [EXEMPLES])
+    # Versions relues comme après DUREE_VERSION ; le cache des requêtes est gardé
+    db._versions.clear()
+
+    assert db.version_table(config.TABLE_CUBE) != version_avant
+    ajoutees = compteurs[f"{config.TABLE_ANALYSES}.ajoutees"]
+    assert ajoutees > 0
+    apres = charger_cube()
+    assert apres["nombre"].sum() == avant["nombre"].sum() + ajoutees
+
+
+def test_import_interrompu_garde_les_versions_des_lots_ecrits(base, tmp_path):
+    fichier = tmp_path / "coupe.jsonl"
+    with open(EXEMPLES, encoding="utf-8") as f:
+        fichier.write_text(f.read() + "{ligne coupée\n", encoding="utf-8")
+    db.connexion().close()
+    db.reconnecter()
+    con = duckdb.connect(base)
+    try:
+        avant = db.version_enregistree(con, config.TABLE_RESTAURANTS)
+        with pytest.raises(ValueError):
+            ingestion.importer([str(fichier)], con, taille_lot=2)
+        assert db.version_enregistree(con, config.TABLE_RESTAURANTS) != avant
+    finally:
+        con.close()
+
+
+def test_reimport_sans_changement(base):
+    premier = _importer(base, [EXEMPLES, YELP, GOOGLE])
+    assert premier[f"{config.TABLE_RESTAURANTS}.ajoutees"] == 9
+    second = _importer(base, [EXEMPLES, YELP, GOOGLE])
+    for table_name in config.TABLES_SOURCES:
+        assert second[f"{table_name}.ajoutees"] == 0
+        assert second[f"{table_name}.mises_a_jour"] == 0
+
+
+def test_villes_a_la_graphie_deja_en_base(base):
+    _importer(base, [EXEMPLES])
+    villes = db.requete(f"SELECT DISTINCT ville FROM {config.TABLE_ANALYSES} WHERE ville ILIKE 'aix%'", mode="all")
+    assert villes == [("Aix en Provence",)]
+
+
+def test_aplatir_yelp_et_google():
+    bordeaux = list(ingestion.aplatir(ingestion.lire([YELP])))
+    assert bordeaux[0] == {
+        "id_source": "yelp-bdx-1", "nom": "La Tupina", "ville": "Bordeaux", "specialite": "Française",
+        "prix": "€€€", "latitude": 44.8336, "longitude": -0.5640, "notation": 4.4,
+    }
+    nice = list(ingestion.aplatir(ingestion.lire([GOOGLE])))
+    assert nice[1] == {
+        "id_source": "gp-nice-2", "nom": "Chez Pipo", "ville": "nice", "specialite": "Socca",
+        "prix": 0, "latitude": 43.7006, "longitude": 7.2850, "notation": 4.5,
+    }
+
+
+@pytest.mark.parametrize("valeur, attendue", [
+    (4.5, 4.5), ("4,2", 4.2), ("4.5/5", 4.5), ("8/10", 4.0), (" 9 / 10 ", 4.5),
+    ("n/a", None), (7.5, None), (-1, None), (True, None), (None, None), (float("nan"), None),
+])
+def test_note(valeur, attendue):
+    assert ingestion.note(valeur) == attendue
+
+
+@pytest.mark.parametrize("valeur, attendu", [
+    ("€", "Bon marché"), ("$$$", "Cher"), ("€€€€€", "Très cher"), (0, "Bon marché"), (2, "Modéré"),
+    (4, "Très cher"), ("modere", "Modéré"), ("Prix libre", "Prix libre"), (" ", None), (None, None),
+    (True, None), (float("nan"), None),
+])
+def test_libelle_prix(valeur, attendu):
+    assert ingestion.libelle_prix(valeur) == attendu
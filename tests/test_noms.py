@@ -0,0 +1,92 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+import demarrage
+from distances import distances_km
+import index_disque
+import moteur
+import noms
+
+MOTS = ["pizza", "bella", "chez", "le", "bistrot", "café", "crêperie", "l'été", "sushi", "royal", "marché", "ﬁne", "ＢＡＲ"]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    aleatoire = random.Random(0)
+    nb = 3000
+    data = pd.DataFrame({
+        "ville": "Lyon",
+        "spécialité": "Pizza",
+        "niveau de prix (libellé)": "Modéré",
+        "latitude": [aleatoire.uniform(42, 51) if aleatoire.random() > 0.02 else None for _ in range(nb)],
+        "longitude": [aleatoire.uniform(-4, 8) for _ in range(nb)],
+        "nom": [
+            " ".join(aleatoire.choice(MOTS) for _ in range(aleatoire.randint(1, 4)))
+            + (f" {aleatoire.randint(1, 99)}" if aleatoire.random() < 0.3 else "")
+            for _ in range(nb)
+        ],
+        "notation": 4.5,
+    })
+    return noms.IndexNoms.construire(data, str(tmp_path_factory.mktemp("index") / "noms"))
+
+
+def _exhaustive(index, texte, k, position):
+    """Classement attendu, en comparant la requête à chaque nom."""
+    requete = set(noms.trigrammes(noms.plier(texte), prefixe=not texte.endswith(" ")).tolist())
+    par_nom = [set() for _ in range(len(index.nb_trigrammes))]
+    for rang, trigramme in enumerate(index.trigrammes):
+        for ligne in index.postings[index.debuts[rang]:index.debuts[rang + 1]]:
+            par_nom[ligne].add(int(trigramme))
+    communs = np.array([len(requete & t) for t in par_nom])
+    lignes = np.flatnonzero(communs >= max(1, int(np.ceil(noms.SEUIL_SIMILARITE * len(requete)))))
+    score = noms._similarite(communs[lignes], len(requete), index.nb_trigrammes[lignes])
+    if position is not None:
+        distances = distances_km(position[0], position[1], index.latitude[lignes], index.longitude[lignes])
+        score = score - noms._penalite(np.nan_to_num(distances, nan=noms.DISTANCE_MAX_KM))
+    lignes = lignes[np.lexsort((lignes, -score))[:k]]
+    return list(zip(index.lignes["nom"].iloc[lignes], index.lignes["latitude"].iloc[lignes].fillna(-1)))
+
+
+def test_trigrammes_de_chaque_nom(index):
+    for ligne, nom in enumerate(index.lignes["nom"][:300]):
+        attendus = noms.trigrammes(noms.plier(nom))
+        rangs = np.searchsorted(index.trigrammes, attendus)
+        assert all(ligne in index.postings[index.debuts[r]:index.debuts[r + 1]] for r in rangs)
+        assert index.nb_trigrammes[ligne] == len(attendus)
+
+
+@pytest.mark.parametrize("texte", ["p", "pizza b", "le ", "creperie l ete", "royl", "bar", "fine 4", "zzz"])
+@pytest.mark.parametrize("position", [None, (45.76, 4.83), (10.0, 100.0)])
+def test_rechercher_comme_la_recherche_exhaustive(index, texte, position):
+    for k in (1, 20):
+        resultat = index.rechercher(texte, k, position)
+        assert list(zip(resultat["nom"], resultat["latitude"].fillna(-1))) == _exhaustive(index, texte, k, position)
+
+
+def test_index_noms_construit_en_arriere_plan(base, tmp_path, monkeypatch):
+    monkeypatch.setattr(demarrage, "_prechauffages", {})
+    monkeypatch.setattr(noms, "_index", index_disque.IndexVersionne(
+        str(tmp_path), config.TABLE_RESTAURANTS, noms._construire, noms.IndexNoms.charger, noms.FORMAT
+    ))
+    assert noms.index_noms(attendre=False) is None
+    for tache in list(demarrage._prechauffages.values()):
+        tache.result(60)
+    index = noms.index_noms(attendre=False)
+    assert index is not None
+    assert index.rechercher("Restaurant 42", 5)["nom"].iloc[0] == "Restaurant 42"
+
+
+def test_rechercher_nom_en_sql(base):
+    data = moteur.rechercher_nom("restaurant 12", 10)
+    assert len(data) == 10
+    assert data["nom"].str.contains("12").all()
+    assert data["nom"].iloc[0] == "Restaurant 12"
+
+    position = (45.76, 4.83)
+    proches = moteur.rechercher_nom("Restaurant 1", 10, position)
+    assert proches["distance_km"].is_monotonic_increasing
+    assert moteur.rechercher_nom("1_%", 10).empty
@@ -0,0 +1,46 @@
+import duckdb
+import pytest
+
+import config
+import db
+import preparation
+
+
+@pytest.fixture
+def con(base):
+    db.connexion().close()
+    db.reconnecter()
+    con = duckdb.connect(base)
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize("table_name", [config.TABLES_SOURCES[0], config.TABLE_CUBE])
+def test_reecriture_annulee_sans_nouvelle_version(con, monkeypatch, table_name):
+    nouvelle_version = db.nouvelle_version
+
+    def echouer(con, nom):
+        if nom == table_name:
+            raise RuntimeError("interrompu")
+        nouvelle_version(con, nom)
+
+    source = config.TABLES_SOURCES[0]
+    con.execute(f"UPDATE {source} SET ville = '  ' || ville || '  '")
+    con.execute(f"DROP TABLE {config.TABLE_CUBE}")
+    versions = {t: db.version_enregistree(con, t) for t in config.TABLES}
+    monkeypatch.setattr(db, "nouvelle_version", echouer)
+
+    with pytest.raises(RuntimeError):
+        preparation.preparer(con)
+
+    if table_name == source:
+        # Table source ni réécrite ni renumérotée
+        assert con.execute(f"SELECT COUNT(*) FROM {source} WHERE ville LIKE ' %'").fetchone()[0] > 0
+        assert db.version_enregistree(con, source) == versions[source]
+    else:
+        # Les tables sources sont préparées, le cube n'est pas publié
+        assert con.execute(f"SELECT COUNT(*) FROM {source} WHERE ville LIKE ' %'").fetchone()[0] == 0
+        assert db.version_enregistree(con, source) != versions[source]
+        tables = {t for (t,) in con.execute("SHOW TABLES").fetchall()}
+        assert config.TABLE_CUBE not in tables
+        assert db.version_enregistree(con, config.TABLE_CUBE) == versions[config.TABLE_CUBE]
@@ -0,0 +1,85 @@
+import os
+
+import duckdb
+import pandas as pd
+import pytest
+
+from benchmarks.generateur import generer
+import config
+import db
+import moteur
+import replique
+
+RECHERCHES = [
+    {},
+    {"specialite": "Pizza"},
+    {"prix_code": 1, "note_min": 4.5},
+    {"position": (45.764, 4.8357), "rayon": 5},
+    {"specialite": "Sushi", "position": (48.8566, 2.3522), "rayon": 10, "note_min": 4.0},
+]
+
+
+@pytest.fixture
+def distante(tmp_path, monkeypatch):
+    """Base jouant le rôle de MotherDuck."""
+    chemin = generer(2000, str(tmp_path / "distante.duckdb"))
+    monkeypatch.setattr(config, "chemin_motherduck", lambda: chemin)
+    monkeypatch.setattr(config, "CHEMIN_REPLIQUE", str(tmp_path / "replique" / "miam.duckdb"))
+    yield chemin
+    db.reconnecter()
+    db._versions.clear()
+    db.cache.vider()
+
+
+def _resultats(monkeypatch, source):
+    monkeypatch.setattr(config, "SOURCE", source)
+    db.reconnecter()
+    db._versions.clear()
+    db.cache.vider()
+    resultats = []
+    for params in RECHERCHES:
+        data = moteur.rechercher(**params)
+        # Ordre physique différent : on compare à nom égal
+        colonnes = [c for c in data.columns if c not in moteur.COLONNES_CATEGORIELLES]
+        resultats.append(data[colonnes].sort_values("nom").reset_index(drop=True))
+    return resultats
+
+
+def _comparer(monkeypatch):
+    for distants, locaux in zip(_resultats(monkeypatch, "motherduck"), _resultats(monkeypatch, "locale")):
+        pd.testing.assert_frame_equal(distants, locaux)
+
+
+def test_replique_repond_comme_la_base_distante(distante, monkeypatch):
+    with duckdb.connect(distante) as con:
+        versions = replique.synchroniser(config.CHEMIN_REPLIQUE, con=con)
+    assert set(versions.values()) == {1}
+    _comparer(monkeypatch)
+
+
+def test_synchronisation_incrementale_sans_arreter_l_application(distante, monkeypatch):
+    with duckdb.connect(distante) as con:
+        replique.synchroniser(config.CHEMIN_REPLIQUE, con=con)
+    monkeypatch.setattr(config, "SOURCE", "locale")
+    db._versions.clear()
+    avant = len(moteur.rechercher(specialite="Pizza"))
+    premier_fichier = os.path.realpath(config.CHEMIN_REPLIQUE)
+
+    with duckdb.connect(distante) as con:
+        table_name = config.TABLE_RESTAURANTS
+        con.execute(f"""UPDATE {table_name} SET notation = 5.0 WHERE nom IN ('Restaurant 1', 'Restaurant 2')""")
+        con.execute(f"""DELETE FROM {table_name} WHERE nom = 'Restaurant 3'""")
+        con.execute(f"""INSERT INTO {table_name} SELECT * REPLACE ('Restaurant neuf' AS nom, 'Pizza' AS "spécialité") FROM {table_name} LIMIT 1""")
+        db.nouvelle_version(con, table_name)
+        versions = replique.synchroniser(config.CHEMIN_REPLIQUE, con=con)
+        # Rien n'a changé depuis : aucune nouvelle réplique
+        assert replique.synchroniser(config.CHEMIN_REPLIQUE, con=con) == versions
+
+    assert versions[config.TABLE_RESTAURANTS] == 2
+    assert versions[config.TABLE_ANALYSES] == 1
+    # L'application, toujours connectée à la première réplique, passe à la
+    # nouvelle à sa prochaine vérification de version
+    assert os.path.realpath(config.CHEMIN_REPLIQUE) != premier_fichier
+    db._versions.clear()
+    assert len(moteur.rechercher(specialite="Pizza")) == avant + 1
+    _comparer(monkeypatch)
@@ -0,0 +1,87 @@
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import service
+
+
+@pytest.fixture
+def serveur(base, monkeypatch):
+    monkeypatch.setattr(service, "cache_reponses", service.CacheTTL(duree_vie=60))
+    serveur = service.Serveur(("127.0.0.1", 0), nb_threads=2)
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{serveur.server_port}"
+    serveur.shutdown()
+    serveur.server_close()
+    thread.join()
+
+
+def _brut(requete):
+    return urllib.parse.parse_qs(requete)
+
+
+@pytest.mark.parametrize("requete", [
+    "specialite=Inconnue",
+    "prix=Gratuit",
+    "lat=45.76",
+    "lon=4.83",
+    "lat=91&lon=4.83",
+    "lat=45.76&lon=-181",
+    "lat=45.76&lon=4.83&rayon=51",
+    "lat=45.76&lon=4.83&rayon=-1",
+    "note_min=5.5",
+    "note_min=nan",
+    "page=0",
+    "taille=201",
+    "taille=dix",
+])
+def test_parametres_invalides(base, requete):
+    with pytest.raises(service.ParametreInvalide):
+        service.normaliser_recherche(_brut(requete))
+
+
+def test_valeurs_par_defaut(base):
+    assert service.normaliser_recherche({}) == {
+        "specialite": None, "prix_code": None, "note_min": None, "position": None,
+        "rayon": None, "page": 1, "taille": service.TAILLE_PAGE,
+    }
+    params = service.normaliser_recherche(_brut("lat=45.76&lon=4.83"))
+    assert params["rayon"] == 10
+
+
+def test_cle_de_cache_normalisee(base):
+    # Espaces, valeurs vides, dernière valeur répétée et position arrondie à ~10 m
+    a = service.normaliser_recherche(_brut("specialite=Pizza&prix=Modéré&lat=45.76001&lon=4.83&note_min=4&note_min=4.5"))
+    b = service.normaliser_recherche(_brut("specialite=+Pizza+&prix=Modéré&lat=45.76&lon=4.830004&note_min=4.5&rayon=&page=1"))
+    assert a == b
+    assert a["position"] == (45.76, 4.83)
+    assert a["prix_code"] == 2
+    c = service.normaliser_recherche(_brut("specialite=Pizza&prix=Modéré&lat=45.7601&lon=4.83&note_min=4.5"))
+    assert tuple(c.items()) != tuple(a.items())
+
+
+def test_requetes_http(serveur):
+    with urllib.request.urlopen(f"{serveur}/recherche?specialite=Pizza&lat=45.764&lon=4.8357&rayon=20&taille=5") as reponse:
+        assert reponse.status == 200
+        corps = json.loads(reponse.read())
+    assert corps["taille"] == 5
+    assert 0 < len(corps["resultats"]) <= 5
+    distances = [r["distance_km"] for r in corps["resultats"]]
+    assert distances == sorted(distances) and distances[-1] <= 20
+    assert all(r["spécialité"] == "Pizza" for r in corps["resultats"])
+
+    # Même recherche écrite autrement : servie par le cache
+    hits = service.cache_reponses.hits
+    with urllib.request.urlopen(f"{serveur}/recherche?specialite=Pizza&lat=45.76400&lon=4.8357&rayon=20&taille=5&page=") as reponse:
+        assert json.loads(reponse.read()) == corps
+    assert service.cache_reponses.hits == hits + 1
+
+    with pytest.raises(urllib.error.HTTPError) as erreur:
+        urllib.request.urlopen(f"{serveur}/recherche?lat=45.764")
+    assert erreur.value.code == 400
+    assert "lat et lon" in json.loads(erreur.value.read())["erreur"]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from distances import distances_km
+import voisins
+
+SPECIALITES = ["Pizza", "Sushi", "Crêperie", None]
+
+
+@pytest.fixture(scope="module")
+def donnees():
+    aleatoire = np.random.default_rng(0)
+    nb = 20000
+    data = pd.DataFrame({
+        "ville": "X",
+        "spécialité": aleatoire.choice(np.array(SPECIALITES, dtype=object), nb),
+        "niveau de prix (libellé)": "Modéré",
+        "latitude": aleatoire.uniform(42, 51, nb),
+        "longitude": aleatoire.uniform(-4, 8, nb),
+        "nom": [f"Restaurant {i}" for i in range(nb)],
+        "notation": np.where(aleatoire.random(nb) < 0.1, np.nan, aleatoire.uniform(3, 5, nb)).round(1),
+        "prix_code": aleatoire.integers(1, 5, nb),
+    })
+    data.loc[:50, "latitude"] = np.nan
+    return data
+
+
+@pytest.fixture(scope="module")
+def dossier(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("index") / "voisins")
+
+
+@pytest.fixture(scope="module")
+def index(donnees, dossier):
+    return voisins.IndexVoisins.construire(donnees, dossier)
+
+
+def _exhaustive(donnees, lat, lon, k, specialite=None, prix_code=None, note_min=None, rayon_max=None):
+    data = donnees.dropna(subset=["latitude", "longitude"])
+    if specialite is not None:
+        data = data[data["spécialité"] == specialite]
+    if prix_code is not None:
+        data = data[data["prix_code"] == prix_code]
+    if note_min is not None:
+        data = data[data["notation"] >= note_min]
+    distances = distances_km(lat, lon, data["latitude"], data["longitude"])
+    if rayon_max is not None:
+        data, distances = data[distances <= rayon_max], distances[distances <= rayon_max]
+    return data["nom"].to_numpy()[np.argsort(distances, kind="stable")[:k]].tolist()
+
+
+def test_plus_proches_comme_la_recherche_exhaustive(donnees, index):
+    aleatoire = np.random.default_rng(1)
+    for _ in range(100):
+        lat, lon = aleatoire.uniform(41, 52), aleatoire.uniform(-5, 9)
+        filtres = {
+            "specialite": aleatoire.choice(["Pizza", "Sushi", None]),
+            "prix_code": aleatoire.choice([None, 2, 3]),
+            "note_min": aleatoire.choice([None, 4.0, 4.5]),
+        }
+        k = int(aleatoire.integers(1, 60))
+        resultat = index.plus_proches(lat, lon, k, **filtres)
+        assert resultat["nom"].tolist() == _exhaustive(donnees, lat, lon, k, **filtres)
+        assert resultat["distance_km"].is_monotonic_increasing
+
+
+def test_rayon_maximal(donnees, index):
+    resultat = index.plus_proches(45.76, 4.83, 500, rayon_max=20)
+    assert resultat["nom"].tolist() == _exhaustive(donnees, 45.76, 4.83, 500, rayon_max=20)
+    assert (resultat["distance_km"] <= 20).all()
+
+
+def test_sans_resultat(index):
+    assert index.plus_proches(45.76, 4.83, 0).empty
+    assert index.plus_proches(45.76, 4.83, 10, specialite="Inconnue").empty
+
+
+def test_index_rouvert_depuis_le_disque(donnees, index, dossier):
+    rouvert = voisins.IndexVoisins.charger(dossier)
+    for lat, lon in [(45.76, 4.83), (48.39, -4.48), (43.3, 5.37)]:
+        attendu = index.plus_proches(lat, lon, 30, specialite="Sushi", note_min=4.0)
+        pd.testing.assert_frame_equal(rouvert.plus_proches(lat, lon, 30, specialite="Sushi", note_min=4.0), attendu)
+        assert attendu["nom"].tolist() == _exhaustive(donnees, lat, lon, 30, specialite="Sushi", note_min=4.0)
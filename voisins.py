@@ -0,0 +1,194 @@
+"""Index des plus proches restaurants : kd-tree sur les positions en vecteurs unitaires 3D.
+
+L'index est construit une fois par version de la table des restaurants,
+enregistré dans donnees/index_voisins/ puis rouvert en mémoire mappée au
+démarrage suivant (voir index_disque.py). Une recherche des k plus
+proches ne parcourt que les feuilles dont la boîte peut encore contenir un
+meilleur candidat, avec filtres optionnels sur la spécialité, le prix et
+la note.
+"""
+import heapq
+import os
+
+import numpy as np
+
+import config
+import db
+from distances import MARGE_ELLIPSOIDE, RAYON_MOYEN_KM, distances_km
+import index_disque
+from index_disque import COLONNES_LIGNES
+
+TAILLE_FEUILLE = 64
+DOSSIER_INDEX = os.path.join(config.DOSSIER_DONNEES, "index_voisins")
+
+
+def vecteurs_unitaires(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype="float64"))
+    lon = np.radians(np.asarray(longitudes, dtype="float64"))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _corde(distance_km):
+    # Longueur de la corde correspondant à une distance sur la sphère
+    return 2 * np.sin(min(distance_km / RAYON_MOYEN_KM, np.pi) / 2)
+
+
+def _elargir(corde_carre):
+    """Carré de la corde d'une distance sur la sphère allongée de MARGE_ELLIPSOIDE."""
+    angle = 2 * np.arcsin(min(np.sqrt(corde_carre) / 2, 1.0))
+    return _corde(angle * RAYON_MOYEN_KM * MARGE_ELLIPSOIDE) ** 2
+
+
+def _construire_arbre(points):
+    """Ordre des points et tableaux des nœuds ; chaque feuille est une plage contiguë."""
+    ordre = np.arange(len(points))
+    debut, fin, gauche, droite, boite_min, boite_max = [], [], [], [], [], []
+    if not len(points):
+        vides = {nom: np.empty(0, dtype="int64") for nom in ("debut", "fin", "gauche", "droite")}
+        return ordre, {**vides, "boite_min": np.empty((0, 3)), "boite_max": np.empty((0, 3))}
+
+    def nouveau_noeud(d, f):
+        debut.append(d)
+        fin.append(f)
+        gauche.append(-1)
+        droite.append(-1)
+        boite_min.append(None)
+        boite_max.append(None)
+        return len(debut) - 1
+
+    pile = [nouveau_noeud(0, len(points))]
+    while pile:
+        noeud = pile.pop()
+        d, f = debut[noeud], fin[noeud]
+        pts = points[ordre[d:f]]
+        boite_min[noeud], boite_max[noeud] = pts.min(axis=0), pts.max(axis=0)
+        if f - d <= TAILLE_FEUILLE:
+            continue
+        # Coupe à la médiane selon l'axe le plus étendu
+        axe = int(np.argmax(boite_max[noeud] - boite_min[noeud]))
+        milieu = (f - d) // 2
+        ordre[d:f] = ordre[d:f][np.argpartition(pts[:, axe], milieu)]
+        gauche[noeud] = nouveau_noeud(d, d + milieu)
+        droite[noeud] = nouveau_noeud(d + milieu, f)
+        pile.extend([gauche[noeud], droite[noeud]])
+
+    return ordre, {
+        "debut": np.array(debut, dtype="int64"),
+        "fin": np.array(fin, dtype="int64"),
+        "gauche": np.array(gauche, dtype="int64"),
+        "droite": np.array(droite, dtype="int64"),
+        "boite_min": np.array(boite_min),
+        "boite_max": np.array(boite_max),
+    }
+
+
+class IndexVoisins:
+    def __init__(self, tableaux, specialites, lignes):
+        self.__dict__.update(tableaux)
+        self.specialites = {s: i for i, s in enumerate(specialites)}
+        self.lignes = lignes
+        # Structure des nœuds en listes Python : accès unitaire rapide pendant
+        # le parcours ; points, codes et notes restent en mémoire mappée.
+        self._noeuds = list(zip(
+            self.debut.tolist(), self.fin.tolist(), self.gauche.tolist(), self.droite.tolist()
+        ))
+        self._boites = np.stack([np.asarray(self.boite_min), np.asarray(self.boite_max)], axis=1)
+
+    @classmethod
+    def construire(cls, data, dossier):
+        """Construit l'index de ``data`` (restaurants avec coordonnées) et l'enregistre dans ``dossier``."""
+        data = data.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+        points = vecteurs_unitaires(data["latitude"], data["longitude"])
+        ordre, tableaux = _construire_arbre(points)
+        data = data.iloc[ordre].reset_index(drop=True)
+        specialites = sorted(data["spécialité"].dropna().astype(str).unique())
+        codes = {s: i for i, s in enumerate(specialites)}
+        tableaux["points"] = points[ordre]
+        tableaux["specialite_code"] = data["spécialité"].map(codes).fillna(-1).to_numpy(dtype="int32")
+        tableaux["prix_code"] = data["prix_code"].fillna(-1).to_numpy(dtype="int32")
+        tableaux["notation"] = data["notation"].to_numpy(dtype="float64", na_value=np.nan)
+
+        index_disque.sauver(dossier, tableaux, data[COLONNES_LIGNES], {"specialites": specialites})
+        return cls.charger(dossier)
+
+    @classmethod
+    def charger(cls, dossier):
+        tableaux, lignes, meta = index_disque.charger(dossier)
+        return cls(tableaux, meta["specialites"], lignes)
+
+    def plus_proches(self, lat, lon, k, specialite=None, prix_code=None, note_min=None, rayon_max=None):
+        """Les ``k`` restaurants les plus proches respectant les filtres, avec ``distance_km``.
+
+        L'arbre compare des cordes sur la sphère ; les candidats sont gardés
+        jusqu'à la k-ième corde élargie de MARGE_ELLIPSOIDE, puis classés
+        par distance sur l'ellipsoïde (celle qui est affichée).
+        """
+        if k <= 0 or (specialite is not None and specialite not in self.specialites):
+            return self.lignes.iloc[:0].assign(distance_km=[])
+        q = vecteurs_unitaires([lat], [lon])[0]
+        seuil = np.inf if rayon_max is None else _corde(rayon_max * MARGE_ELLIPSOIDE) ** 2
+        meilleurs_d = np.empty(0)
+        meilleurs_i = np.empty(0, dtype="int64")
+        tas = [(0.0, 0)] if self._noeuds else []
+        while tas:
+            d_boite, noeud = heapq.heappop(tas)
+            if d_boite > seuil:
+                break
+            d, f, g, dr = self._noeuds[noeud]
+            if g >= 0:
+                # Distance minimale de q aux boîtes des deux enfants
+                boites = self._boites[[g, dr]]
+                ecarts = np.maximum(0, np.maximum(boites[:, 0] - q, q - boites[:, 1]))
+                for enfant, d_enfant in zip((g, dr), np.einsum("ij,ij->i", ecarts, ecarts).tolist()):
+                    if d_enfant <= seuil:
+                        heapq.heappush(tas, (d_enfant, enfant))
+                continue
+
+            ecarts = self.points[d:f] - q
+            dist = np.einsum("ij,ij->i", ecarts, ecarts)
+            masque = dist <= seuil
+            if specialite is not None:
+                masque &= self.specialite_code[d:f] == self.specialites[specialite]
+            if prix_code is not None:
+                masque &= self.prix_code[d:f] == prix_code
+            if note_min is not None:
+                masque &= self.notation[d:f] >= note_min
+            trouves = np.nonzero(masque)[0]
+            if not len(trouves):
+                continue
+            meilleurs_d = np.concatenate([meilleurs_d, dist[trouves]])
+            meilleurs_i = np.concatenate([meilleurs_i, trouves + d])
+            if len(meilleurs_d) >= k:
+                seuil = min(seuil, _elargir(float(np.partition(meilleurs_d, k - 1)[k - 1])))
+                garder = meilleurs_d <= seuil
+                meilleurs_d, meilleurs_i = meilleurs_d[garder], meilleurs_i[garder]
+
+        resultat = self.lignes.iloc[meilleurs_i].reset_index(drop=True)
+        distances = distances_km(
+            lat, lon,
+            resultat["latitude"].to_numpy(dtype="float64"),
+            resultat["longitude"].to_numpy(dtype="float64"),
+        )
+        garder = np.lexsort((meilleurs_i, distances))[:k]
+        if rayon_max is not None:
+            garder = garder[distances[garder] <= rayon_max]
+        resultat = resultat.iloc[garder].reset_index(drop=True)
+        resultat["distance_km"] = distances[garder]
+        return resultat
+
+
+def _construire(dossier):
+    data = db.executer(f"""
+        SELECT {", ".join(f'"{c}"' for c in COLONNES_LIGNES)}, prix_code
+        FROM {config.TABLE_RESTAURANTS}
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """).fetchdf()
+    return IndexVoisins.construire(data, dossier)
+
+
+_index = index_disque.IndexVersionne(DOSSIER_INDEX, config.TABLE_RESTAURANTS, _construire, IndexVoisins.charger)
+
+
+def index_voisins():
+    """Index de la version courante de la table des restaurants (construit ou rouvert)."""
+    return _index.obtenir()